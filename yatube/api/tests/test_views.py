@@ -0,0 +1,138 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(settings.ITEMS_PER_PAGE + 1):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тестовый пост {i}',
+            )
+        cls.post = Post.objects.latest('pub_date', 'pk')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_return_json_with_cursor(self):
+        """Ленты отдают JSON и ссылку на следующую страницу."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': 'author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(
+                    len(data['results']), settings.ITEMS_PER_PAGE
+                )
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertEqual(data['results'][0]['group'], 'test-slug')
+                self.assertIsNone(data['previous'])
+                second = self.client.get(data['next']).json()
+                self.assertEqual(len(second['results']), 1)
+                self.assertIsNone(second['next'])
+
+    def test_sparse_fields(self):
+        data = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            {'fields': 'id,text'}
+        ).json()
+        self.assertEqual(data, {'id': self.post.pk, 'text': self.post.text})
+        response = self.client.get(reverse('api:index'), {'fields': 'pk'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_modified_skips_post_bodies(self):
+        """Совпавший ETag даёт 304 без выборки текстов постов."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(any('"text"' in query['sql'] for query in queries))
+
+    def test_feed_delete_is_not_hidden_by_date(self):
+        """Удаление поста со страницы ленты не даёт 304 по дате."""
+        url = reverse('api:index')
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        deleted = response.json()['results'][1]['id']
+        Post.objects.filter(pk=deleted).delete()
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(
+            deleted, [post['id'] for post in response.json()['results']]
+        )
+
+    def test_last_modified(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_on_edit_and_comment(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        etags = [self.client.get(url)['ETag']]
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый текст'
+        post.save()
+        etags.append(self.client.get(url)['ETag'])
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comments_count'], 1)
+        etags.append(response['ETag'])
+        self.assertEqual(len(set(etags)), 3)
+
+    def test_follow_feed(self):
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.reader_client.get(url).json()['results'], [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url)
+        self.assertEqual(response.json()['results'][0]['id'], self.post.pk)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_errors_are_json(self):
+        responses = (
+            (self.client.get(reverse(
+                'api:group_list', kwargs={'slug': 'missing'}
+            )), 404),
+            (self.client.get(reverse(
+                'api:post_detail', kwargs={'post_id': 0}
+            )), 404),
+            (self.client.post(reverse('api:index')), 405),
+        )
+        for response, status in responses:
+            with self.subTest(status=status):
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
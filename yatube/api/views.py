@@ -0,0 +1,226 @@
+"""JSON-версии лент и поста для мобильных клиентов, только для чтения.
+
+Страница сначала выбирается с одними ``KEY_FIELDS``. По id и ``version``
+её постов и версиям их авторов, групп и комментариев строится сильный
+``ETag``, а у отдельного поста по ``updated_at`` ещё и ``Last-Modified``
+(у лент его нет: удаление поста или его уход со страницы не сдвигают
+самое новое ``updated_at``). Если валидатор
+клиента совпал, ответ ``304`` уходит без загрузки текстов постов и без
+сериализации.
+"""
+import hashlib
+
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date
+from posts.cache import (
+    feed_cache_key, get_versions, post_version_keys, version_key,
+)
+from posts.models import Group, Post, User
+from posts.timeline import TimelinePaginator
+from posts.utils import CursorPaginator
+
+FIELDS = (
+    'id', 'version', 'text', 'pub_date', 'updated_at', 'author', 'group',
+    'image', 'thumbnail', 'comments_count',
+)
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def api_view(view):
+    """Только GET и HEAD; ``ApiError`` превращается в JSON с ошибкой."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise ApiError(405, 'Метод не поддерживается.')
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            response = JsonResponse(
+                {'detail': error.detail}, status=error.status
+            )
+            if error.status == 405:
+                response['Allow'] = 'GET, HEAD'
+            return response
+    return wrapper
+
+
+def requested_fields(request):
+    """Поля из ``?fields=id,text``; без параметра — все."""
+    value = request.GET.get('fields', '')
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = sorted(set(fields) - set(FIELDS))
+    if unknown:
+        raise ApiError(400, 'Неизвестные поля: {}.'.format(', '.join(unknown)))
+    return fields or list(FIELDS)
+
+
+def serialize_post(post, fields, request):
+    data = {
+        'id': post.pk,
+        'version': post.version,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'updated_at': post.updated_at.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': (
+            request.build_absolute_uri(post.image.url) if post.image else None
+        ),
+        'thumbnail': (
+            request.build_absolute_uri(post.thumbnail)
+            if post.thumbnail else None
+        ),
+        'comments_count': post.comments_count,
+    }
+    return {field: data[field] for field in fields}
+
+
+def make_etag(request, posts, extra=()):
+    """Сильный ETag из адреса запроса, id и версий постов."""
+    keys = [
+        key for post in posts
+        for key in post_version_keys(post) + [version_key('comments', post.pk)]
+    ]
+    state = repr((
+        request.build_absolute_uri(),
+        [(post.pk, post.version) for post in posts],
+        get_versions(keys),
+        extra,
+    ))
+    return '"{}"'.format(hashlib.md5(state.encode()).hexdigest())
+
+
+def conditional_json(
+    request, posts, build, extra=(), private=False, dated=False
+):
+    """``304`` по валидаторам ``posts`` или JSON из ``build(full_posts)``.
+
+    ``full_posts`` — те же посты со всеми полями ленты, в том же порядке.
+    ``dated`` добавляет ``Last-Modified`` по ``updated_at`` постов.
+    """
+    etag = make_etag(request, posts, extra)
+    last_modified = None
+    if dated:
+        last_modified = max(post.updated_at for post in posts)
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if response is None:
+        found = Post.objects.for_feed().in_bulk([post.pk for post in posts])
+        response = JsonResponse(
+            build([found[post.pk] for post in posts if post.pk in found])
+        )
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def cursor_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri('?' + query.urlencode())
+
+
+def feed_response(request, paginator, private=False):
+    fields = requested_fields(request)
+    posts = list(paginator.get_page_by_cursor(request.GET.get('cursor')))
+
+    def build(full_posts):
+        return {
+            'results': [
+                serialize_post(post, fields, request) for post in full_posts
+            ],
+            'next': cursor_url(request, paginator.next_cursor),
+            'previous': cursor_url(request, paginator.previous_cursor),
+        }
+    return conditional_json(
+        request, posts, build,
+        extra=(paginator.next_cursor, paginator.previous_cursor),
+        private=private,
+    )
+
+
+def feed_paginator(posts, *cache_key_parts):
+    return CursorPaginator(
+        posts.keys_only(),
+        settings.ITEMS_PER_PAGE,
+        cache_key=feed_cache_key(*cache_key_parts)
+    )
+
+
+@api_view
+def index(request):
+    """Главная лента"""
+    return feed_response(request, feed_paginator(Post.objects, 'index'))
+
+
+@api_view
+def group_posts(request, slug):
+    """Лента группы"""
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        raise ApiError(404, 'Группа не найдена.')
+    posts = Post.objects.filter(group_id=group_id)
+    return feed_response(request, feed_paginator(posts, 'group', group_id))
+
+
+@api_view
+def profile(request, username):
+    """Посты автора"""
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        raise ApiError(404, 'Автор не найден.')
+    posts = Post.objects.filter(author_id=author_id)
+    return feed_response(request, feed_paginator(posts, 'author', author_id))
+
+
+@api_view
+def post_detail(request, post_id):
+    """Один пост"""
+    fields = requested_fields(request)
+    post = Post.objects.keys_only().filter(pk=post_id).first()
+    if post is None:
+        raise ApiError(404, 'Пост не найден.')
+
+    def build(full_posts):
+        if not full_posts:
+            raise ApiError(404, 'Пост не найден.')
+        return serialize_post(full_posts[0], fields, request)
+    return conditional_json(request, [post], build, dated=True)
+
+
+@api_view
+def follow_index(request):
+    """Лента подписок текущего пользователя"""
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация.')
+    paginator = TimelinePaginator(
+        request.user, settings.ITEMS_PER_PAGE, keys_only=True
+    )
+    return feed_response(request, paginator, private=True)
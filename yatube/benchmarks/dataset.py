@@ -0,0 +1,178 @@
+"""Синтетический набор данных для замеров лент.
+
+Популярность авторов и постов распределена по закону Ципфа: немногие
+авторы собирают большую часть подписок, немногие посты — большую часть
+комментариев. Число постов автора от его популярности не зависит, иначе
+ленты подписок вырастают на порядки больше настоящих. Данные пишутся
+пачками через ``bulk_create`` без сигналов, после чего счётчики и поисковый
+индекс пересобираются, а ленты подписок заполняются одним ``INSERT …
+SELECT``.
+"""
+import itertools
+import random
+
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from posts.counters import rebuild_counters
+from posts.models import Comment, Follow, Group, Post
+from posts.search import rebuild_index
+from posts.timeline import rebuild_timelines
+from posts.transfer import batched, explicit_pub_date
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+USERNAME_PREFIX = 'bench_user_'
+
+
+@dataclass
+class Dataset:
+    users: int = 100_000
+    groups: int = 100
+    posts: int = 1_000_000
+    comments: int = 1_000_000
+    follows_per_user: int = 20
+    # Показатель закона Ципфа: чем больше, тем сильнее перекос к лидерам
+    skew: float = 1.1
+    # Посты распределены по этому числу дней до текущего момента
+    days: int = 365
+    seed: int = 1
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса для ``random.choices``: i-й элемент ~ 1 / i**skew."""
+    return list(itertools.accumulate(
+        1 / (rank ** skew) for rank in range(1, size + 1)
+    ))
+
+
+def bulk_insert(model, objects, **kwargs):
+    count = 0
+    for batch in batched(objects, BATCH_SIZE):
+        model.objects.bulk_create(batch, **kwargs)
+        count += len(batch)
+    return count
+
+
+class Generator:
+    def __init__(self, dataset, log=None):
+        self.dataset = dataset
+        self.rng = random.Random(dataset.seed)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def run(self, timelines=True):
+        """Загрузить набор и пересобрать производные данные."""
+        with transaction.atomic(), explicit_pub_date(Post, Comment):
+            user_ids = self.create_users()
+            group_ids = self.create_groups()
+            post_ids = self.create_posts(user_ids, group_ids)
+            self.create_follows(user_ids)
+            self.create_comments(user_ids, post_ids)
+        self.log('Пересчёт счётчиков')
+        rebuild_counters()
+        self.log('Поисковый индекс')
+        rebuild_index()
+        if timelines:
+            self.log('Ленты подписок')
+            rebuild_timelines(user_ids)
+
+    def create_users(self):
+        first = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        count = bulk_insert(User, (
+            User(
+                username=f'{USERNAME_PREFIX}{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password='!',
+            )
+            for number in range(first, first + self.dataset.users)
+        ))
+        self.log(f'Пользователей: {count}')
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('pk').values_list('pk', flat=True)[first:])
+
+    def create_groups(self):
+        first = Group.objects.count()
+        bulk_insert(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'bench-group-{number}',
+                description=f'Описание группы {number}',
+            )
+            for number in range(first, first + self.dataset.groups)
+        ))
+        return list(Group.objects.filter(
+            slug__startswith='bench-group-'
+        ).values_list('pk', flat=True))
+
+    def random_date(self):
+        return self.now - timedelta(
+            seconds=self.rng.random() * self.dataset.days * 86400
+        )
+
+    def create_posts(self, user_ids, group_ids):
+        user_ids = self.rng.sample(user_ids, len(user_ids))
+        authors = zipf_weights(len(user_ids), self.dataset.skew)
+        words = ('лента', 'пост', 'кэш', 'запрос', 'индекс', 'страница')
+
+        def posts():
+            for number in range(self.dataset.posts):
+                author_id, = self.rng.choices(user_ids, cum_weights=authors)
+                yield Post(
+                    author_id=author_id,
+                    group_id=(
+                        self.rng.choice(group_ids)
+                        if group_ids and self.rng.random() < 0.7 else None
+                    ),
+                    text=' '.join(self.rng.choices(words, k=30)),
+                    pub_date=self.random_date(),
+                )
+        count = bulk_insert(Post, posts())
+        self.log(f'Постов: {count}')
+        return list(Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[:count])
+
+    def create_follows(self, user_ids):
+        authors = zipf_weights(len(user_ids), self.dataset.skew)
+
+        def follows():
+            for user_id in user_ids:
+                size = min(
+                    int(self.rng.paretovariate(1.5)
+                        * self.dataset.follows_per_user / 3),
+                    len(user_ids) - 1
+                )
+                chosen = set(self.rng.choices(
+                    user_ids, cum_weights=authors, k=size
+                ))
+                chosen.discard(user_id)
+                for author_id in chosen:
+                    yield Follow(user_id=user_id, author_id=author_id)
+        count = bulk_insert(Follow, follows(), ignore_conflicts=True)
+        self.log(f'Подписок: {count}')
+
+    def create_comments(self, user_ids, post_ids):
+        if not post_ids:
+            return
+        popular = zipf_weights(len(post_ids), self.dataset.skew)
+
+        def comments():
+            for number in range(self.dataset.comments):
+                post_id, = self.rng.choices(post_ids, cum_weights=popular)
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    text=f'Комментарий {number}',
+                    pub_date=self.random_date(),
+                )
+        count = bulk_insert(Comment, comments())
+        self.log(f'Комментариев: {count}')
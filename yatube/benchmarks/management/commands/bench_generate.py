@@ -0,0 +1,36 @@
+import time
+
+from benchmarks.dataset import Dataset, Generator
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для замеров.'
+
+    def add_arguments(self, parser):
+        defaults = Dataset()
+        for name in ('users', 'groups', 'posts', 'comments',
+                     'follows_per_user', 'days', 'seed'):
+            parser.add_argument(
+                '--' + name.replace('_', '-'),
+                type=int,
+                default=getattr(defaults, name),
+            )
+        parser.add_argument('--skew', type=float, default=defaults.skew)
+        parser.add_argument(
+            '--skip-timelines',
+            action='store_true',
+            help='Не собирать ленты подписок после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        dataset = Dataset(**{
+            field: options[field] for field in Dataset.__dataclass_fields__
+        })
+        started = time.perf_counter()
+        Generator(dataset, log=self.stdout.write).run(
+            timelines=not options['skip_timelines']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.perf_counter() - started:.1f} с.'
+        ))
@@ -0,0 +1,50 @@
+import json
+
+from benchmarks.runner import DRIVERS, SCENARIOS, Benchmark
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержки и число запросов лент и пишет JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold-cache',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--driver', action='append', choices=DRIVERS, dest='drivers',
+        )
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            dest='scenarios',
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для JSON; по умолчанию стандартный вывод.',
+        )
+
+    def handle(self, *args, **options):
+        benchmark = Benchmark(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            cold_cache=options['cold_cache'],
+            drivers=options['drivers'] or DRIVERS,
+            scenarios=options['scenarios'] or SCENARIOS,
+        )
+        try:
+            report = benchmark.run()
+        except ValueError as error:
+            raise CommandError(error)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {options["output"]}.')
+        )
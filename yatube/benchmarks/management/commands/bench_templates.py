@@ -0,0 +1,40 @@
+import json
+
+from benchmarks.rendering import SCENARIOS, RenderBenchmark
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Замеряет отрисовку шаблонов страницы ленты без базы и пишет JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            dest='scenarios',
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для JSON; по умолчанию стандартный вывод.',
+        )
+
+    def handle(self, *args, **options):
+        benchmark = RenderBenchmark(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            scenarios=options['scenarios'] or SCENARIOS,
+        )
+        try:
+            report = benchmark.run()
+        except ValueError as error:
+            raise CommandError(error)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output'] == '-':
+            self.stdout.write(text)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {options["output"]}.')
+        )
@@ -0,0 +1,104 @@
+"""Замер отрисовки шаблонов лент отдельно от базы.
+
+Посты страницы загружаются один раз до замера, поэтому в измеренное время
+попадает только отрисовка; число SQL-запросов во время отрисовки тоже
+записывается в результат и должно быть нулевым. Сценарии:
+
+* ``cards`` — карточки страницы без кэша фрагментов, как при первом показе;
+* ``page_cold`` — вся главная страница с пустым кэшем карточек;
+* ``page_warm`` — вся главная страница с карточками из кэша.
+"""
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from posts.cache import CARD_TEMPLATE, card_template
+from posts.models import Post
+from posts.utils import WindowedPaginator
+
+from .runner import PERCENTILES, git_revision, percentile
+
+SCENARIOS = ('cards', 'page_cold', 'page_warm')
+PAGE_TEMPLATE = 'posts/index.html'
+
+
+class RenderBenchmark:
+    def __init__(self, iterations=200, warmup=10, scenarios=SCENARIOS):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.scenarios = scenarios
+
+    def page(self):
+        posts = list(Post.objects.for_feed()[:settings.ITEMS_PER_PAGE])
+        if not posts:
+            raise ValueError(
+                'Нет постов для замера: сначала запустите bench_generate.'
+            )
+        return WindowedPaginator(
+            posts, settings.ITEMS_PER_PAGE, count=len(posts)
+        ).page(1)
+
+    def renderers(self, page_obj):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = {'page_obj': page_obj, 'keyword': ''}
+
+        def cards():
+            template = card_template(CARD_TEMPLATE)
+            for post in page_obj:
+                template.render({'post': post})
+
+        def page():
+            render_to_string(PAGE_TEMPLATE, context, request=request)
+
+        return {
+            'cards': (cards, None),
+            'page_cold': (page, cache.clear),
+            'page_warm': (page, None),
+        }
+
+    def measure(self, render, prepare):
+        timings, queries = [], []
+        for attempt in range(self.warmup + self.iterations):
+            if prepare is not None:
+                prepare()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                render()
+                elapsed = time.perf_counter() - started
+            if attempt >= self.warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+        result = {
+            'iterations': self.iterations,
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries_max': max(queries),
+        }
+        for rank in PERCENTILES:
+            result[f'p{rank}_ms'] = round(percentile(timings, rank), 3)
+        return result
+
+    def run(self):
+        page_obj = self.page()
+        renderers = self.renderers(page_obj)
+        results = {
+            name: self.measure(*renderers[name]) for name in self.scenarios
+        }
+        return {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'engines': [engine.name for engine in engines.all()],
+            'cached_loader': not settings.TEMPLATES_RELOAD,
+            'posts_per_page': len(page_obj),
+            'results': results,
+        }
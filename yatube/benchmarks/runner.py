@@ -0,0 +1,203 @@
+"""Замер задержек и числа SQL-запросов представлений ``posts``.
+
+Запросы выполняются в том же процессе двумя способами: через
+``django.test.Client`` и напрямую через WSGI-приложение проекта, без
+сервера и сети. WSGI-драйвер, как настоящий сервер, закрывает соединение
+с базой после каждого запроса и проверяет CSRF, поэтому POST-сценарии
+замеряются только через ``Client``. Результат — словарь для JSON.
+"""
+import io
+import platform
+import statistics
+import subprocess
+import time
+
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'add_comment',
+)
+DRIVERS = ('client', 'wsgi')
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, rank):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(int(round(rank / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class ClientDriver:
+    name = 'client'
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, method, url, data=None):
+        if method == 'POST':
+            return self.client.post(url, data).status_code
+        return self.client.get(url).status_code
+
+
+class WSGIDriver:
+    """Вызов WSGI-приложения проекта с готовым окружением запроса."""
+    name = 'wsgi'
+
+    def __init__(self, user):
+        self.application = get_wsgi_application()
+        client = Client()
+        client.force_login(user)
+        self.cookie = '; '.join(
+            f'{key}={morsel.value}' for key, morsel in client.cookies.items()
+        )
+
+    def request(self, method, url, data=None):
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': url,
+            'HTTP_COOKIE': self.cookie,
+            'wsgi.input': io.BytesIO(),
+        }
+        setup_testing_defaults(environ)
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split()[0]))
+        body = self.application(environ, start_response)
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return status[0]
+
+
+class Benchmark:
+    def __init__(self, iterations=50, warmup=5, cold_cache=False,
+                 drivers=DRIVERS, scenarios=SCENARIOS):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cold_cache = cold_cache
+        self.drivers = drivers
+        self.scenarios = scenarios
+
+    def targets(self):
+        """Самые нагруженные объекты: так замер ближе к худшему случаю."""
+        follower_id = Follow.objects.values('user').annotate(
+            total=Count('pk')
+        ).order_by('-total').values_list('user', flat=True).first()
+        follower = User.objects.filter(pk=follower_id).first()
+        author = User.objects.order_by('-counters__posts_count').first()
+        group = Group.objects.order_by('-posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if None in (follower, author, post):
+            raise ValueError(
+                'Нет данных для замера: сначала запустите bench_generate.'
+            )
+        return follower, author, group, post
+
+    def requests(self, author, group, post):
+        group_url = (
+            reverse('posts:group_list', args=[group.slug]) if group else None
+        )
+        urls = {
+            'index': ('GET', reverse('posts:index'), None),
+            'group_posts': ('GET', group_url, None),
+            'profile': (
+                'GET', reverse('posts:profile', args=[author.username]), None
+            ),
+            'post_detail': (
+                'GET', reverse('posts:post_detail', args=[post.pk]), None
+            ),
+            'follow_index': ('GET', reverse('posts:follow_index'), None),
+            'add_comment': (
+                'POST',
+                reverse('posts:add_comment', args=[post.pk]),
+                {'text': 'Комментарий из замера'},
+            ),
+        }
+        return {
+            name: urls[name] for name in self.scenarios
+            if urls[name][1] is not None
+        }
+
+    def measure(self, driver, method, url, data):
+        timings, queries, statuses = [], [], set()
+        for attempt in range(self.warmup + self.iterations):
+            if self.cold_cache:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                statuses.add(driver.request(method, url, data))
+                elapsed = time.perf_counter() - started
+            if attempt >= self.warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+        result = {
+            'method': method,
+            'url': url,
+            'statuses': sorted(statuses),
+            'iterations': self.iterations,
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries_mean': round(statistics.mean(queries), 2),
+            'queries_max': max(queries),
+        }
+        for rank in PERCENTILES:
+            result[f'p{rank}_ms'] = round(percentile(timings, rank), 3)
+        return result
+
+    def run(self):
+        follower, author, group, post = self.targets()
+        drivers = {'client': ClientDriver, 'wsgi': WSGIDriver}
+        results = {}
+        for driver_name in self.drivers:
+            driver = drivers[driver_name](follower)
+            for name, request in self.requests(author, group, post).items():
+                if request[0] == 'POST' and driver_name == 'wsgi':
+                    continue
+                results[f'{driver_name}:{name}'] = self.measure(
+                    driver, *request
+                )
+        return {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'cold_cache': self.cold_cache,
+            'dataset': {
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+            'results': results,
+        }
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from posts.models import Comment, Follow, Post, TimelineEntry
+
+
+class BenchmarkCommandsTests(TransactionTestCase):
+    def test_generate_and_run(self):
+        """Малый набор данных загружается и замеряется обоими драйверами."""
+        call_command(
+            'bench_generate', '--users=20', '--groups=3', '--posts=60',
+            '--comments=40', '--follows-per-user=4', stdout=StringIO()
+        )
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(TimelineEntry.objects.exists())
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_run', '--iterations=2', '--warmup=0',
+                f'--output={output}', stdout=StringIO()
+            )
+            with open(output, encoding='utf-8') as report_file:
+                report = json.load(report_file)
+        self.assertEqual(report['dataset']['posts'], 60)
+        self.assertIn('client:add_comment', report['results'])
+        self.assertNotIn('wsgi:add_comment', report['results'])
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertLess(max(result['statuses']), 400)
+                self.assertGreater(result['queries_mean'], 0)
+
+    def test_templates(self):
+        """Отрисовка страницы замеряется без запросов к базе."""
+        call_command(
+            'bench_generate', '--users=5', '--groups=2', '--posts=20',
+            '--comments=0', '--follows-per-user=1', '--skip-timelines',
+            stdout=StringIO()
+        )
+        output = StringIO()
+        call_command(
+            'bench_templates', '--iterations=3', '--warmup=1', stdout=output
+        )
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['posts_per_page'], settings.ITEMS_PER_PAGE)
+        self.assertEqual(
+            set(report['results']), {'cards', 'page_cold', 'page_warm'}
+        )
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertEqual(result['queries_max'], 0)
+                self.assertGreater(result['mean_ms'], 0)
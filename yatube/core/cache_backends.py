@@ -0,0 +1,431 @@
+"""Кэши, общие для всех процессов gunicorn.
+
+``SQLiteCache`` хранит записи в одном файле SQLite и работает без внешних
+сервисов. ``RedisCache`` говорит с Redis (или совместимым сервером) по
+протоколу RESP напрямую, без дополнительных пакетов.
+"""
+import os
+import pickle
+import random
+import select
+import socket
+import sqlite3
+import threading
+import time
+
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SQLITE_MAX_VARIABLES = 900
+# INCRBY только существующего ключа, одной атомарной командой на сервере
+REDIS_INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end"
+)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL.
+
+    Чтение не блокирует запись, ``incr`` и ``add`` атомарны между процессами.
+    При переполнении ``MAX_ENTRIES`` удаляется ``1/CULL_FREQUENCY`` записей
+    с ближайшим сроком жизни; бессрочные записи (версии) удаляются последними.
+    """
+    cull_probability = 0.01
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            [self._key(key, version)]
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        for start in range(0, len(names), SQLITE_MAX_VARIABLES):
+            chunk = names[start:start + SQLITE_MAX_VARIABLES]
+            rows = self._db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN ({})'
+                .format(', '.join('?' * len(chunk))),
+                chunk
+            )
+            for name, value, expires in rows:
+                if self._alive(expires):
+                    found[keys[name]] = pickle.loads(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), pickle.dumps(value), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows
+            )
+        if random.random() < self.cull_probability * len(rows):
+            self._cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', [key]
+            ).fetchone()
+            if row is not None and self._alive(row[0]):
+                return False
+            db.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                [key, pickle.dumps(value), self.get_backend_timeout(timeout)]
+            )
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        name = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', [name]
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                [pickle.dumps(value), name]
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT expires FROM cache WHERE key = ?', [key]
+            ).fetchone()
+            if row is None or not self._alive(row[0]):
+                return False
+            db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?',
+                [self.get_backend_timeout(timeout), key]
+            )
+        return True
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        with self._transaction() as db:
+            db.executemany(
+                'DELETE FROM cache WHERE key = ?', [[name] for name in names]
+            )
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        with self._transaction() as db:
+            db.execute(
+                'DELETE FROM cache WHERE expires <= ?', [time.time()]
+            )
+            count, = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if count <= self._max_entries:
+                return
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                [max(count // self._cull_frequency, count - self._max_entries)]
+            )
+
+    def _transaction(self):
+        return _Immediate(self._db)
+
+
+class _Immediate:
+    """``BEGIN IMMEDIATE`` … ``COMMIT``: запись без гонок между процессами."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args):
+    """Команда в формате RESP: массив bulk-строк."""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """Ответ RESP; ответ-ошибка возвращается как ``RedisError``.
+
+    Ошибка не поднимается сразу, чтобы остальные ответы пакета были
+    дочитаны и не достались следующей команде на этом соединении.
+    """
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Соединение с Redis закрыто')
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body
+    if kind == b'-':
+        return RedisError(body.decode())
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        if length < 0:
+            return None
+        return stream.read(length + 2)[:-2]
+    if kind == b'*':
+        length = int(body)
+        if length < 0:
+            return None
+        return [read_reply(stream) for _ in range(length)]
+    raise RedisError(f'Неизвестный ответ Redis: {line!r}')
+
+
+class RedisCache(BaseCache):
+    """Кэш в Redis по адресу вида ``redis://[:password@]host:port/db``.
+
+    Целые числа хранятся как есть, чтобы ``incr`` выполнялся на сервере
+    командой ``INCRBY``; остальные значения сериализуются pickle.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location)
+        self._address = (url.hostname or '127.0.0.1', url.port or 6379)
+        self._password = url.password
+        self._db = int(url.path.strip('/') or 0)
+        self._socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 1
+        )
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(
+            self._address, timeout=self._socket_timeout
+        )
+        stream = sock.makefile('rb')
+        self._local.connection = (sock, stream, os.getpid())
+        if self._password:
+            self._call(sock, stream, ['AUTH', self._password])
+        if self._db:
+            self._call(sock, stream, ['SELECT', self._db])
+        return sock, stream
+
+    @staticmethod
+    def _call(sock, stream, *commands):
+        sock.sendall(b''.join(encode_command(*args) for args in commands))
+        return [read_reply(stream) for _ in commands]
+
+    def _disconnect(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            connection[0].close()
+
+    @staticmethod
+    def _stale(sock):
+        """Соединение закрыто сервером: в простое читать из него нечего."""
+        try:
+            return bool(select.select([sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def _execute(self, *commands, retry=True):
+        """Отправить команды одним пакетом и вернуть ответы по порядку.
+
+        При обрыве соединения идемпотентные команды повторяются один раз на
+        новом. Остальные (``retry=False``) не повторяются: сервер мог
+        выполнить их, а потерян только ответ. Для них закрытое сервером
+        соединение заменяется новым до отправки.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or connection[2] != os.getpid() or (
+            not retry and self._stale(connection[0])
+        ):
+            connection = self._connect()
+        try:
+            replies = self._call(connection[0], connection[1], *commands)
+        except RedisError:
+            # Непонятный ответ: дальше поток ответов не разобрать
+            self._disconnect()
+            raise
+        except (ConnectionError, OSError):
+            self._disconnect()
+            if not retry:
+                raise
+            sock, stream = self._connect()
+            replies = self._call(sock, stream, *commands)
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value)
+
+    @staticmethod
+    def _load(value):
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            return pickle.loads(value)
+
+    def _expiry(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return []
+        return ['PX', max(int(timeout * 1000), 1)]
+
+    def get(self, key, default=None, version=None):
+        value, = self._execute(['GET', self._key(key, version)])
+        return default if value is None else self._load(value)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values, = self._execute(
+            ['MGET'] + [self._key(key, version) for key in keys]
+        )
+        return {
+            key: self._load(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is not None and timeout is not DEFAULT_TIMEOUT and (
+            timeout <= 0
+        ):
+            self.delete_many(data, version)
+            return []
+        self._execute(*(
+            ['SET', self._key(key, version), self._dump(value)]
+            + self._expiry(timeout)
+            for key, value in data.items()
+        ))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        reply, = self._execute(
+            ['SET', self._key(key, version), self._dump(value), 'NX']
+            + self._expiry(timeout),
+            retry=False
+        )
+        return reply is not None
+
+    def incr(self, key, delta=1, version=None):
+        value, = self._execute(
+            ['EVAL', REDIS_INCR_SCRIPT, 1, self._key(key, version), delta],
+            retry=False
+        )
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry:
+            reply, = self._execute(['PEXPIRE', key, expiry[1]])
+        else:
+            reply, = self._execute(['PERSIST', key])
+            reply = reply or self.has_key(key)
+        return bool(reply)
+
+    def has_key(self, key, version=None):
+        reply, = self._execute(['EXISTS', self._key(key, version)])
+        return bool(reply)
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._execute(['DEL'] + keys)
+
+    def clear(self):
+        self._execute(['FLUSHDB'])
@@ -0,0 +1,139 @@
+"""Настройка соединений с базой и проверка её состояния.
+
+``configure_sqlite`` применяет ``SQLITE_PRAGMAS`` к каждому новому
+соединению SQLite. ``database_health`` проверяет, что база отвечает и
+что настройки соединения действительно применились; по нему работают
+системная проверка (``manage.py check --tag database`` и ``migrate``)
+и проверка при запуске WSGI-приложения. ``replicate_sqlite`` заменяет
+репликацию для реплик SQLite (см. ``core.routers``).
+"""
+import json
+import logging
+import sqlite3
+import time
+
+from contextlib import closing
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Числовые значения, которые SQLite возвращает вместо имён
+PRAGMA_VALUES = {
+    'synchronous': {'off': 0, 'normal': 1, 'full': 2, 'extra': 3},
+    'temp_store': {'default': 0, 'file': 1, 'memory': 2},
+}
+# Не действуют для базы в памяти, с которой работают тесты
+FILE_PRAGMAS = {'journal_mode', 'mmap_size'}
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик ``connection_created``: PRAGMA для нового соединения."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def sqlite_problems(connection, cursor):
+    problems = []
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        if name in FILE_PRAGMAS and connection.is_in_memory_db():
+            continue
+        cursor.execute(f'PRAGMA {name}')
+        actual = cursor.fetchone()[0]
+        expected = PRAGMA_VALUES.get(name, {}).get(str(value).lower(), value)
+        if str(actual).lower() != str(expected).lower():
+            problems.append(f'PRAGMA {name} = {actual}, ожидалось {value}')
+    return problems
+
+
+def database_health(alias='default'):
+    """Доступность базы, время ответа и состояние постоянного соединения."""
+    connection = connections[alias]
+    conn_max_age = connection.settings_dict['CONN_MAX_AGE']
+    report = {
+        'alias': alias,
+        'vendor': connection.vendor,
+        'persistent': conn_max_age is None or conn_max_age > 0,
+        'reused': connection.connection is not None,
+        'ok': False,
+        'problems': [],
+    }
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            report['latency_ms'] = round(
+                (time.perf_counter() - started) * 1000, 2
+            )
+            if connection.vendor == 'sqlite':
+                report['problems'] += sqlite_problems(connection, cursor)
+    except DatabaseError as error:
+        report['error'] = str(error)
+        return report
+    report['ok'] = True
+    if not report['persistent'] and not settings.DEBUG:
+        report['problems'].append(
+            'CONN_MAX_AGE = 0: каждый запрос открывает новое соединение'
+        )
+    return report
+
+
+@checks.register(checks.Tags.database)
+def check_databases(app_configs, **kwargs):
+    issues = []
+    for alias in connections:
+        report = database_health(alias)
+        if not report['ok']:
+            issues.append(checks.Error(
+                f'База {alias} недоступна: {report["error"]}',
+                id='core.E001',
+            ))
+        issues.extend(
+            checks.Warning(f'База {alias}: {problem}', id='core.W001')
+            for problem in report['problems']
+        )
+    return issues
+
+
+def check_on_startup():
+    """Проверить базы при запуске и закрыть соединения перед fork."""
+    if not settings.DATABASE_CHECK_ON_STARTUP:
+        return
+    try:
+        for alias in connections:
+            report = database_health(alias)
+            logger.info(json.dumps(report, ensure_ascii=False))
+            if not report['ok']:
+                raise ImproperlyConfigured(
+                    f'База {alias} недоступна: {report["error"]}'
+                )
+            for problem in report['problems']:
+                logger.warning('База %s: %s', alias, problem)
+    finally:
+        connections.close_all()
+
+
+def replicate_sqlite(source, target):
+    """Скопировать базу соединения ``source`` в файл реплики ``target``.
+
+    Копия снимается online backup API SQLite одним шагом, поэтому реплика
+    всегда получает согласованный снимок, а читатели реплики ждут не
+    дольше, чем идёт копирование.
+    """
+    if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+        raise ImproperlyConfigured(
+            'Копирование реплик работает только для SQLite.'
+        )
+    source.ensure_connection()
+    with closing(sqlite3.connect(
+        target.settings_dict['NAME'],
+        timeout=target.settings_dict['OPTIONS'].get('timeout', 5),
+    )) as replica:
+        source.connection.backup(replica)
@@ -0,0 +1,38 @@
+import time
+
+from core.db import replicate_sqlite
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из '
+        'YATUBE_DB_REPLICAS — замена репликации для локального запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять копирование каждые N секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены (YATUBE_DB_REPLICAS).')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                try:
+                    replicate_sqlite(
+                        connections[DEFAULT_DB_ALIAS], connections[alias]
+                    )
+                except ImproperlyConfigured as error:
+                    raise CommandError(error)
+                self.stdout.write(f'{alias}: скопировано.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
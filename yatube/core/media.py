@@ -0,0 +1,173 @@
+"""Отдача загруженных файлов из ``MEDIA_ROOT`` без чтения байтов в Python.
+
+Способ задаёт ``MEDIA_ACCEL``:
+
+* ``nginx`` — пустой ответ с ``X-Accel-Redirect`` на внутренний location
+  ``MEDIA_ACCEL_PREFIX``; файл, ``Range`` и условные запросы обслуживает
+  nginx::
+
+      location /protected-media/ {
+          internal;
+          alias /path/to/media/;
+      }
+
+* ``sendfile`` — ``X-Sendfile`` с путём к файлу (Apache mod_xsendfile,
+  lighttpd);
+* пусто — ``FileResponse``. Весь файл gunicorn отдаёт через
+  ``wsgi.file_wrapper`` системным вызовом ``sendfile``, а ``Range`` с одним
+  диапазоном читается из файла только в пределах этого диапазона.
+
+``ETag`` совпадает по формату с nginx (время изменения и размер в hex),
+поэтому валидаторы не меняются при переключении способа.
+
+``MEDIA_ACCESS`` — путь к функции ``(request, name) -> bool``. С ней
+закрытый файл даёт 404, а ответы кэшируются только в браузере.
+"""
+import mimetypes
+import os
+import re
+
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat, suffix=''):
+    return '"{:x}-{:x}{}"'.format(int(stat.st_mtime), stat.st_size, suffix)
+
+
+def authenticated_only(request, name):
+    """Политика ``MEDIA_ACCESS``: файлы только для вошедших."""
+    return request.user.is_authenticated
+
+
+@lru_cache(maxsize=None)
+def access_check(path):
+    return import_string(path)
+
+
+def media_path(request, name):
+    """Путь к файлу ``name`` в ``MEDIA_ROOT`` или ``Http404``."""
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    if settings.MEDIA_ACCESS and not access_check(settings.MEDIA_ACCESS)(
+        request, name
+    ):
+        raise Http404
+    return path
+
+
+def byte_range(header, size):
+    """Первый и последний байт из ``Range`` с одним диапазоном.
+
+    ``None``, если заголовка нет или он не разобран: тогда отдаётся весь
+    файл. ``ValueError``, если диапазон не пересекается с файлом (416).
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        if int(last) == 0:
+            raise ValueError('Пустой диапазон.')
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError('Диапазон за концом файла.')
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class FileRange:
+    """Часть файла для ``FileResponse``: ``read`` не выходит за диапазон."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def accel_response(path, name):
+    response = HttpResponse()
+    if settings.MEDIA_ACCEL == 'nginx':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(
+            name
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def file_response(request, path, stat, etag):
+    """``FileResponse`` всего файла или ``206`` с одним диапазоном."""
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not header or if_range is not None and if_range != etag:
+        response = FileResponse(open(path, 'rb'))
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    try:
+        selected = byte_range(header, stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    if selected is None:
+        return FileResponse(open(path, 'rb'))
+    start, end = selected
+    response = FileResponse(
+        FileRange(open(path, 'rb'), start, end - start + 1), status=206
+    )
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, name):
+    """Ответ на запрос файла ``name`` из ``MEDIA_ROOT``."""
+    path = media_path(request, name)
+    stat = os.stat(path)
+    etag = file_etag(stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        if settings.MEDIA_ACCEL:
+            response = accel_response(path, name)
+        else:
+            response = file_response(request, path, stat, etag)
+    response['Content-Type'] = (
+        mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    scope = 'private' if settings.MEDIA_ACCESS else 'public'
+    response['Cache-Control'] = f'{scope}, max-age={settings.MEDIA_MAX_AGE}'
+    if settings.MEDIA_ACCESS:
+        patch_vary_headers(response, ('Cookie',))
+    return response
@@ -0,0 +1,125 @@
+"""Метрики одного запроса: SQL, отрисовка шаблонов и кэш страниц.
+
+Метрики собираются только для выбранных запросов (см.
+``REQUEST_METRICS_SAMPLING``), поэтому остальные запросы не платят за
+инструментирование ничего, кроме одной проверки ``ContextVar``.
+"""
+import json
+import logging
+import threading
+import time
+
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import Template
+
+logger = logging.getLogger('core.metrics')
+
+current = ContextVar('request_metrics', default=None)
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+class RequestMetrics:
+    def __init__(self, view_name):
+        self.view_name = view_name
+        self.started = time.perf_counter()
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+        self.cache = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка ``connection.execute_wrapper`` вокруг каждого запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        return sum(self.queries.values()) - len(self.queries)
+
+    def as_dict(self, response):
+        return {
+            'view': self.view_name,
+            'status': response.status_code,
+            'total_ms': round(
+                (time.perf_counter() - self.started) * 1000, 2
+            ),
+            'queries': sum(self.queries.values()),
+            'duplicate_queries': self.duplicates,
+            'db_ms': round(self.db_time * 1000, 2),
+            'render_ms': round(self.render_time * 1000, 2),
+            'cache': dict(self.cache),
+        }
+
+
+def server_timing(data):
+    """Значение заголовка ``Server-Timing`` для панели разработчика."""
+    parts = [
+        'db;dur={};desc="{} queries, {} duplicates"'.format(
+            data['db_ms'], data['queries'], data['duplicate_queries']
+        ),
+        'render;dur={}'.format(data['render_ms']),
+        'total;dur={}'.format(data['total_ms']),
+    ]
+    parts.extend(
+        'cache-{};desc="{}"'.format(outcome, count)
+        for outcome, count in sorted(data['cache'].items())
+    )
+    return ', '.join(parts)
+
+
+def record_cache(outcome):
+    """Отметить исход чтения кэша страницы: hit, stale или miss."""
+    metrics = current.get()
+    if metrics is not None:
+        metrics.cache[outcome] += 1
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = deque(maxlen=settings.REQUEST_METRICS_BUFFER_SIZE)
+    return _buffer
+
+
+def publish(data):
+    get_buffer().append(data)
+    logger.info(json.dumps(data, ensure_ascii=False))
+
+
+def instrument_templates():
+    """Учитывать время отрисовки шаблонов Django в текущих метриках.
+
+    Вложенные ``render_to_string`` (карточки, include) не суммируются
+    повторно: время берётся только у внешней отрисовки.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        metrics = current.get()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        metrics.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.render_depth -= 1
+            if not metrics.render_depth:
+                metrics.render_time += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    Template.render = timed_render
@@ -0,0 +1,191 @@
+import mimetypes
+import os
+import random
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from . import metrics, routers
+from .media import file_etag
+
+# Сжатые копии статики в порядке предпочтения (см. core.storage)
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def view_name(resolver_match):
+    """Имя по ``app_name``: ``posts:index``, а не ``index:index``."""
+    return ':'.join(resolver_match.app_names + [resolver_match.url_name or ''])
+
+
+def accepted_encodings(header):
+    """Кодировки из ``Accept-Encoding`` без отключённых через ``q=0``."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        key, _, value = params.strip().partition('=')
+        try:
+            if key == 'q' and float(value) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def sample_rate(name):
+    rates = settings.REQUEST_METRICS_SAMPLING
+    return rates.get(name, rates.get('*', 0))
+
+
+class RequestMetricsMiddleware:
+    """Число и время SQL-запросов, отрисовка шаблонов и кэш страниц.
+
+    Для выбранных запросов добавляет заголовок ``Server-Timing``, пишет
+    JSON-строку в лог ``core.metrics`` и кладёт её в кольцевой буфер,
+    который отдаёт ``core.views.request_metrics``. Доля выбранных запросов
+    задаётся по имени представления в ``REQUEST_METRICS_SAMPLING``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.instrument_templates()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        request_metrics = getattr(request, '_metrics', None)
+        if request_metrics is None:
+            return response
+        for connection in connections.all():
+            if request_metrics in connection.execute_wrappers:
+                connection.execute_wrappers.remove(request_metrics)
+        metrics.current.reset(request._metrics_token)
+        data = request_metrics.as_dict(response)
+        response['Server-Timing'] = metrics.server_timing(data)
+        metrics.publish(data)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = view_name(request.resolver_match)
+        rate = sample_rate(name)
+        if not rate or random.random() >= rate:
+            return None
+        request._metrics = metrics.RequestMetrics(name)
+        request._metrics_token = metrics.current.set(request._metrics)
+        for connection in connections.all():
+            connection.execute_wrappers.append(request._metrics)
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Включает маршрутизацию чтения на реплики для запроса (``routers``).
+
+    Запрос с cookie ``routers.STICKY_COOKIE`` читает основную базу.
+    Запрос, который что-то записал, ставит эту cookie.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        state = routers.RoutingState(
+            pinned=routers.STICKY_COOKIE in request.COOKIES
+        )
+        token = routers.current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.current.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                routers.STICKY_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_STICKINESS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из ``STATIC_ROOT`` (``STATIC_SERVE``).
+
+    Файлы с хешем в имени (из манифеста ``core.storage``) получают
+    ``Cache-Control: immutable`` на ``STATIC_MAX_AGE``, и браузер их больше
+    не запрашивает; остальные перепроверяются по ``ETag`` и
+    ``Last-Modified``. Если клиент принимает br или gzip и рядом лежит
+    сжатая копия, отдаётся она с ``Content-Encoding`` и
+    ``Vary: Accept-Encoding``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.immutable = set(
+            getattr(staticfiles_storage, 'hashed_files', {}).values()
+        )
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(
+            settings.STATIC_URL
+        ):
+            response = self.serve(
+                request, request.path_info[len(settings.STATIC_URL):]
+            )
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        encoding, variant = self.variant(request, path)
+        stat = os.stat(variant)
+        etag = file_etag(stat, '-' + encoding if encoding else '')
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(stat.st_mtime)
+        )
+        if response is None:
+            response = FileResponse(
+                open(variant, 'rb'),
+                content_type=(
+                    mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                ),
+            )
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if name in self.immutable:
+            response['Cache-Control'] = (
+                f'public, max-age={settings.STATIC_MAX_AGE}, immutable'
+            )
+        else:
+            response['Cache-Control'] = 'public, no-cache'
+        if any(
+            os.path.exists(path + suffix) for _, suffix in STATIC_ENCODINGS
+        ):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def variant(self, request, path):
+        """Кодировка и путь к файлу, который лучше всего отдать клиенту."""
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for encoding, suffix in STATIC_ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + suffix):
+                return encoding, path + suffix
+        return None, path
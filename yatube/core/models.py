@@ -11,3 +11,33 @@ class PubdateModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class VersionedModel(models.Model):
+    """Абстрактная модель. Время и номер последнего изменения.
+
+    Номер растёт на единицу при каждом сохранении существующей записи,
+    в том числе с ``update_fields``. Увеличение идёт в базе, поэтому
+    две одновременные правки не получат один номер.
+    """
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='date_of_update'
+    )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='version'
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if self._state.adding:
+            return super().save(*args, update_fields=update_fields, **kwargs)
+        self.version = models.F('version') + 1
+        if update_fields is not None:
+            update_fields = {*update_fields, 'updated_at', 'version'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+        self.refresh_from_db(fields=['version'])
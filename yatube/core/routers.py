@@ -0,0 +1,79 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в ``DATABASE_REPLICAS``. Маршрутизация работает
+только внутри запроса (``ReplicaRoutingMiddleware``): команды, миграции и
+фоновые потоки всегда читают основную базу.
+
+Внутри запроса чтение уходит на реплику, выбранную случайно при первом
+чтении и одну на весь запрос: разные реплики отстают по-разному, и
+страница не должна собираться из нескольких состояний базы. Так читается,
+пока запрос ничего не записал. После первой записи остаток запроса читает
+основную базу, а ответ получает cookie ``STICKY_COOKIE``: следующие
+``DATABASE_REPLICA_STICKINESS`` секунд этот пользователь тоже читает
+основную базу и видит свои изменения, даже если реплика отстаёт.
+"""
+import random
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'yatube_primary'
+# Всегда читаются с основной базы: сессию, которой ещё нет на реплике,
+# SessionMiddleware считает пустой и стирает cookie пользователя
+PRIMARY_APPS = {'sessions'}
+
+current = ContextVar('database_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+@contextmanager
+def primary():
+    """Читать основную базу внутри блока.
+
+    Нужно для всего, что попадает в общий кэш под текущими версиями:
+    собранное по отставшей реплике осталось бы в нём до следующей записи.
+    """
+    state = current.get()
+    if state is None:
+        yield
+        return
+    pinned, state.pinned = state.pinned, True
+    try:
+        yield
+    finally:
+        state.pinned = pinned or state.wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current.get()
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            state is None or state.pinned or not replicas
+            or model._meta.app_label in PRIMARY_APPS
+        ):
+            return DEFAULT_DB_ALIAS
+        if state.replica not in replicas:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,64 @@
+"""Хранилище статики: имена с хешем содержимого и сжатые копии.
+
+``collectstatic`` с ``CompressedManifestStorage`` раскладывает в
+``STATIC_ROOT`` файлы вида ``css/bootstrap.min.1a2b3c4d5e6f.css`` и
+``staticfiles.json`` с соответствием имён, а рядом с текстовыми файлами
+кладёт ``.gz`` и, если установлен пакет ``brotli``, ``.br``. Такие копии
+отдаёт ``core.middleware.StaticFilesMiddleware`` или фронтовой сервер
+(``gzip_static``/``brotli_static`` в nginx).
+"""
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.svg', '.txt', '.xml', '.json', '.html', '.ico',
+)
+# Сжатая копия не пишется, если экономит меньше 5 %
+MIN_RATIO = 0.95
+
+
+def compressed_variants(data):
+    """Пары ``(расширение, байты)`` сжатых копий, которые стоит хранить."""
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    return [
+        (suffix, compressed) for suffix, compressed in variants
+        if len(compressed) < len(data) * MIN_RATIO
+    ]
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    # Файл без записи в манифесте отдаётся под исходным именем, а не
+    # роняет страницу
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Файла нет и в STATIC_ROOT: collectstatic ещё не запускали
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        for suffix, compressed in compressed_variants(data):
+            with open(path + suffix, 'wb') as target:
+                target.write(compressed)
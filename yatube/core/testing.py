@@ -0,0 +1,63 @@
+"""Утилиты для тестов."""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class _AssertMaxQueriesContext(CaptureQueriesContext):
+    def __init__(self, test_case, budget, connection):
+        self.test_case = test_case
+        self.budget = budget
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(self.captured_queries, start=1)
+        )
+        self.test_case.assertLessEqual(
+            len(self), self.budget,
+            f'{len(self)} запросов при бюджете {self.budget}:\n{queries}'
+        )
+
+
+class QueryBudgetMixin:
+    """Проверка, что код укладывается в бюджет SQL-запросов.
+
+    В отличие от ``assertNumQueries`` допускает и меньшее число запросов,
+    поэтому бюджет не нужно править после каждой оптимизации.
+    """
+
+    def assertMaxQueries(self, budget, using=DEFAULT_DB_ALIAS):
+        return _AssertMaxQueriesContext(self, budget, connections[using])
+
+
+class OnCommitMixin:
+    """``captureOnCommitCallbacks`` из Django 3.2.
+
+    ``TestCase`` не фиксирует транзакцию, поэтому колбэки
+    ``transaction.on_commit`` сами не выполняются.
+    """
+
+    @classmethod
+    @contextmanager
+    def captureOnCommitCallbacks(cls, *, using=DEFAULT_DB_ALIAS,
+                                 execute=False):
+        callbacks = []
+        run_on_commit = connections[using].run_on_commit
+        start = len(run_on_commit)
+        try:
+            yield callbacks
+        finally:
+            while True:
+                added = [func for _, func in run_on_commit[start:]]
+                del run_on_commit[start:]
+                callbacks.extend(added)
+                if not execute or not added:
+                    break
+                for func in added:
+                    func()
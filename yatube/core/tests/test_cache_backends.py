@@ -0,0 +1,223 @@
+import io
+import os
+import socket
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from ..cache_backends import (
+    REDIS_INCR_SCRIPT, RedisCache, RedisError, SQLiteCache, encode_command,
+    read_reply,
+)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SQLiteCache(
+            os.path.join(self.directory.name, 'cache.sqlite3'),
+            {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}},
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_basic_operations(self):
+        """Запись, чтение, add, incr и удаление."""
+        self.cache.set('page', {'html': 'текст'})
+        self.assertEqual(self.cache.get('page'), {'html': 'текст'})
+        self.assertFalse(self.cache.add('page', 'другое'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.assertEqual(self.cache.incr('a', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.delete('page')
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_expired_entries_are_not_read(self):
+        """Истёкшая запись не читается, и add её перезаписывает."""
+        self.cache.set('lock', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('lock'))
+        self.assertTrue(self.cache.add('lock', 2))
+        self.assertEqual(self.cache.get('lock'), 2)
+
+    def test_cull_keeps_persistent_entries(self):
+        """При переполнении вытесняются записи со сроком, версии остаются."""
+        self.cache.set('version', 1, timeout=None)
+        for number in range(20):
+            self.cache.set(number, number)
+        self.cache._cull()
+        self.assertLessEqual(len(self.cache.get_many(range(20))), 9)
+        self.assertEqual(self.cache.get('version'), 1)
+
+
+class RespTests(SimpleTestCase):
+    def test_encode_command(self):
+        self.assertEqual(
+            encode_command('SET', 'key', b'value', 'PX', 1000),
+            b'*5\r\n$3\r\nSET\r\n$3\r\nkey\r\n$5\r\nvalue\r\n'
+            b'$2\r\nPX\r\n$4\r\n1000\r\n'
+        )
+
+    def test_read_reply(self):
+        stream = io.BytesIO(
+            b'+OK\r\n:7\r\n$-1\r\n*2\r\n$3\r\nabc\r\n$-1\r\n'
+        )
+        self.assertEqual(
+            [read_reply(stream) for _ in range(4)],
+            [b'OK', 7, None, [b'abc', None]]
+        )
+
+
+def encode_reply(value):
+    if isinstance(value, RedisError):
+        return b'-%s\r\n' % str(value).encode()
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(map(encode_reply, value))
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class FakeRedis:
+    """Redis в памяти на локальном сокете: только команды ``RedisCache``.
+
+    ``drop_replies`` — сколько следующих команд выполнить, но закрыть
+    соединение вместо ответа, как при обрыве сети после записи.
+    ``fail_keys`` — ключи, запись которых отвечает ошибкой ``OOM``.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self.drop_replies = 0
+        self.fail_keys = set()
+        self.connections = []
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections.append(connection)
+            threading.Thread(
+                target=self.handle, args=(connection,), daemon=True
+            ).start()
+
+    def handle(self, connection):
+        stream = connection.makefile('rb')
+        with connection:
+            while True:
+                try:
+                    command = read_reply(stream)
+                except ConnectionError:
+                    return
+                self.commands.append(command[0].decode())
+                reply = self.execute(command[0].decode(), command[1:])
+                if self.drop_replies:
+                    self.drop_replies -= 1
+                    return
+                connection.sendall(encode_reply(reply))
+
+    def execute(self, name, args):
+        if name == 'GET':
+            return self.data.get(args[0])
+        if name == 'MGET':
+            return [self.data.get(key) for key in args]
+        if name == 'SET':
+            if args[0] in self.fail_keys:
+                return RedisError('OOM command not allowed')
+            if b'NX' in args[2:] and args[0] in self.data:
+                return None
+            self.data[args[0]] = args[1]
+            return b'OK'
+        if name == 'DEL':
+            return sum(self.data.pop(key, None) is not None for key in args)
+        if name == 'EXISTS':
+            return int(args[0] in self.data)
+        if name == 'EVAL' and args[0] == REDIS_INCR_SCRIPT.encode():
+            key = args[2]
+            if key not in self.data:
+                return None
+            self.data[key] = b'%d' % (int(self.data[key]) + int(args[3]))
+            return int(self.data[key])
+        raise AssertionError(f'Неожиданная команда {name}')
+
+    def disconnect_clients(self):
+        for connection in self.connections:
+            connection.shutdown(socket.SHUT_RDWR)
+
+    def close(self):
+        self.listener.close()
+
+
+class RedisCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeRedis()
+        self.cache = RedisCache(
+            f'redis://127.0.0.1:{self.server.port}/0', {}
+        )
+
+    def tearDown(self):
+        self.cache._disconnect()
+        self.server.close()
+
+    def test_basic_operations(self):
+        self.cache.set('page', {'html': 'текст'})
+        self.assertEqual(self.cache.get('page'), {'html': 'текст'})
+        self.assertFalse(self.cache.add('page', 'другое'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+
+    def test_error_reply_leaves_connection_usable(self):
+        """Ошибка посреди пакета не оставляет непрочитанных ответов."""
+        self.cache.set('x', 'значение')
+        self.server.fail_keys.add(b':1:b')
+        with self.assertRaisesRegex(RedisError, 'OOM'):
+            self.cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(self.cache.get('x'), 'значение')
+        self.assertEqual(self.cache.get_many(['a', 'c']), {'a': 1, 'c': 3})
+
+    def test_incr_is_one_atomic_command(self):
+        """Версия растёт одной командой; отсутствующий ключ не создаётся."""
+        self.cache.set('version', 5)
+        self.server.commands.clear()
+        self.assertEqual(self.cache.incr('version', 2), 7)
+        self.assertEqual(self.server.commands, ['EVAL'])
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.assertNotIn(b':1:missing', self.server.data)
+        self.assertNotIn('DEL', self.server.commands)
+
+    def test_incr_is_not_retried(self):
+        """Потерянный ответ на incr не приводит к повторному увеличению."""
+        self.cache.set('version', 5)
+        self.server.drop_replies = 1
+        with self.assertRaises(ConnectionError):
+            self.cache.incr('version')
+        self.assertEqual(self.cache.get('version'), 6)
+
+    def test_reads_are_retried(self):
+        """Идемпотентная команда повторяется на новом соединении."""
+        self.cache.set('page', 'html')
+        self.server.drop_replies = 1
+        self.assertEqual(self.cache.get('page'), 'html')
+        self.assertEqual(self.server.commands[-2:], ['GET', 'GET'])
+
+    def test_incr_reconnects_after_server_closed_connection(self):
+        """Соединение, закрытое сервером в простое, заменяется до отправки."""
+        self.cache.set('version', 5)
+        self.server.disconnect_clients()
+        self.assertEqual(self.cache.incr('version'), 6)
@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+
+from ..db import check_databases, database_health, sqlite_problems
+
+
+class DatabaseSettingsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.connection = DatabaseWrapper(
+            {
+                **connection.settings_dict,
+                'NAME': os.path.join(self.directory.name, 'db.sqlite3'),
+            },
+            alias='pragmas',
+        )
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        """Новое соединение SQLite получает WAL и остальные PRAGMA."""
+        with self.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            self.assertEqual(sqlite_problems(self.connection, cursor), [])
+            with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1}):
+                self.assertEqual(
+                    sqlite_problems(self.connection, cursor),
+                    ['PRAGMA busy_timeout = 5000, ожидалось 1']
+                )
+
+    def test_health_check(self):
+        report = database_health()
+        self.assertTrue(report['ok'])
+        self.assertTrue(report['persistent'])
+        self.assertEqual(report['problems'], [])
+        self.assertEqual(check_databases(None), [])
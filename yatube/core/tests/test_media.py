@@ -0,0 +1,107 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..media import byte_range
+
+User = get_user_model()
+
+DATA = bytes(range(256)) * 4
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.root.name, 'posts'))
+        with open(os.path.join(self.root.name, 'posts', 'a b.jpg'), 'wb') as f:
+            f.write(DATA)
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.root.name, MEDIA_ACCEL='', MEDIA_ACCESS=''
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.root.cleanup()
+
+    def get(self, name='posts/a b.jpg', **headers):
+        response = self.client.get('/media/' + name, **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.body, DATA)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(DATA)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['Cache-Control'].startswith('public'))
+
+    def test_range(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, DATA[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(DATA)}')
+        self.assertEqual(response['Content-Length'], '10')
+        response = self.get(HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.body, DATA[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE=f'bytes={len(DATA)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(DATA)}')
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, DATA)
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_nginx_accel(self):
+        response = self.get()
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/a%20b.jpg'
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_ACCEL='sendfile')
+    def test_sendfile(self):
+        response = self.get()
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.root.name, 'posts', 'a b.jpg')
+        )
+
+    @override_settings(MEDIA_ACCESS='core.media.authenticated_only')
+    def test_access_policy(self):
+        self.assertEqual(self.get().status_code, 404)
+        self.client.force_login(User.objects.create_user(username='reader'))
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_missing_and_outside_files(self):
+        for name in ('posts/missing.jpg', 'posts', '../settings.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+        response = self.client.post('/media/posts/a b.jpg')
+        self.assertEqual(response.status_code, 405)
+
+    def test_byte_range(self):
+        self.assertIsNone(byte_range('bytes=5-1', 10))
+        self.assertIsNone(byte_range('bytes=0-1,3-4', 10))
+        self.assertEqual(byte_range('bytes=5-', 10), (5, 9))
+        self.assertEqual(byte_range('bytes=0-100', 10), (0, 9))
+        with self.assertRaises(ValueError):
+            byte_range('bytes=-0', 10)
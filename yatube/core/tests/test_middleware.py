@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import get_buffer
+
+User = get_user_model()
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    @override_settings(REQUEST_METRICS_SAMPLING={'*': 1})
+    def test_server_timing_header(self):
+        """Заголовок Server-Timing содержит SQL, шаблоны и исход кэша."""
+        response = self.guest_client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('cache-miss', timing)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIn('cache-hit', response['Server-Timing'])
+        data = get_buffer()[-1]
+        self.assertEqual(data['view'], 'posts:index')
+        self.assertEqual(data['cache'], {'hit': 1})
+
+    @override_settings(REQUEST_METRICS_SAMPLING={'*': 0, 'posts:index': 1})
+    def test_sampling_by_view_name(self):
+        """Доля измеряемых запросов задаётся по имени представления."""
+        self.assertTrue(
+            self.guest_client.get(reverse('posts:index')).has_header(
+                'Server-Timing'
+            )
+        )
+        self.assertFalse(
+            self.guest_client.get(reverse('about:author')).has_header(
+                'Server-Timing'
+            )
+        )
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """Буфер измерений доступен только персоналу."""
+        url = reverse('request_metrics')
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+        staff_client = Client()
+        staff_client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.assertIn('requests', staff_client.get(url).json())
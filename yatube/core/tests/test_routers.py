@@ -0,0 +1,137 @@
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+from .. import routers
+from ..db import replicate_sqlite
+from ..middleware import ReplicaRoutingMiddleware
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def routed(self, write=False, **cookies):
+        """Базы для чтения до и после ``view`` внутри middleware."""
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_go_to_replica_until_write(self):
+        """Запрос читает реплику, а после своей записи — основную базу."""
+        seen, response = self.routed()
+        self.assertEqual(seen, ['replica', 'replica'])
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        seen, response = self.routed(write=True)
+        self.assertEqual(seen, ['replica', 'default'])
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=['replica', 'other'])
+    def test_one_replica_per_request(self):
+        """Все чтения запроса идут на одну реплику, запросы — на разные."""
+        chosen = set()
+        for _ in range(50):
+            seen = []
+
+            def view(request):
+                for _ in range(10):
+                    seen.append(self.router.db_for_read(Post))
+                return HttpResponse()
+            ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+            self.assertEqual(len(set(seen)), 1)
+            chosen.update(seen)
+        self.assertEqual(chosen, {'replica', 'other'})
+
+    def test_sessions_read_primary(self):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Session))
+            return HttpResponse()
+        ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(seen, ['default'])
+
+    def test_sticky_cookie_reads_primary(self):
+        seen, _ = self.routed(**{routers.STICKY_COOKIE: '1'})
+        self.assertEqual(seen, ['default', 'default'])
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_primary_block(self):
+        seen = []
+
+        def view(request):
+            with routers.primary():
+                seen.append(self.router.db_for_read(Post))
+            seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        ReplicaRoutingMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(seen, ['default', 'replica'])
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class StickyWritesTests(TestCase):
+    def test_follow_sets_sticky_cookie(self):
+        """Подписка (GET с записью) закрепляет читателя за основной базой."""
+        User.objects.create_user(username='author')
+        client = Client()
+        client.force_login(User.objects.create_user(username='reader'))
+        response = client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertIn(routers.STICKY_COOKIE, response.cookies)
+        response = client.get(reverse('posts:index'))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+
+
+class ReplicateSqliteTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.primary, self.replica = (
+            DatabaseWrapper(
+                {
+                    **connection.settings_dict,
+                    'NAME': os.path.join(self.directory.name, alias),
+                },
+                alias=alias,
+            )
+            for alias in ('primary', 'replica')
+        )
+
+    def tearDown(self):
+        self.primary.close()
+        self.replica.close()
+        self.directory.cleanup()
+
+    def test_replica_gets_primary_rows(self):
+        """Реплика после копирования видит строки основной базы."""
+        for value in (1, 2):
+            with self.primary.cursor() as cursor:
+                cursor.execute('CREATE TABLE IF NOT EXISTS t (id integer)')
+                cursor.execute('INSERT INTO t VALUES (%s)', [value])
+            replicate_sqlite(self.primary, self.replica)
+            with self.replica.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM t')
+                self.assertEqual(cursor.fetchone()[0], value)
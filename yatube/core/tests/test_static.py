@@ -0,0 +1,103 @@
+import gzip
+import json
+import os
+import tempfile
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from ..middleware import StaticFilesMiddleware, accepted_encodings
+
+CSS = 'body { color: red; }\n' * 200
+
+
+class StaticFilesTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.TemporaryDirectory()
+        self.root = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.source.name, 'css'))
+        with open(os.path.join(self.source.name, 'css', 'site.css'), 'w') as f:
+            f.write(CSS)
+        with open(os.path.join(self.source.name, 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(range(256)))
+        self.settings_override = override_settings(
+            STATICFILES_DIRS=[self.source.name],
+            STATIC_ROOT=self.root.name,
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'
+            ],
+            STATICFILES_STORAGE='core.storage.CompressedManifestStorage',
+            STATIC_SERVE=True,
+        )
+        self.settings_override.enable()
+        call_command('collectstatic', interactive=False, stdout=StringIO())
+        with open(os.path.join(self.root.name, 'staticfiles.json')) as f:
+            self.hashed = json.load(f)['paths']
+        self.middleware = StaticFilesMiddleware(
+            lambda request: HttpResponse('view')
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.source.cleanup()
+        self.root.cleanup()
+
+    def get(self, name, **headers):
+        request = RequestFactory().get('/static/' + name, **headers)
+        return self.middleware(request)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """Текст получает хеш в имени и .gz-копию, картинка — только хеш."""
+        css = os.path.join(self.root.name, self.hashed['css/site.css'])
+        with gzip.open(css + '.gz', 'rt') as compressed:
+            self.assertEqual(compressed.read(), CSS)
+        self.assertNotEqual(self.hashed['logo.png'], 'logo.png')
+        png = os.path.join(self.root.name, self.hashed['logo.png'])
+        self.assertFalse(os.path.exists(png + '.gz'))
+
+    def test_hashed_files_are_immutable_and_compressed(self):
+        response = self.get(
+            self.hashed['css/site.css'], HTTP_ACCEPT_ENCODING='gzip, br;q=0'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body).decode(), CSS)
+        response.close()
+
+    def test_unhashed_files_are_revalidated(self):
+        response = self.get('css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        response.close()
+        response = self.get(
+            'css/site.css', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_other_paths_go_to_views(self):
+        for path in ('../settings.py', 'missing.css'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).content, b'view')
+        response = self.middleware(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'view')
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, br;q=0, deflate'),
+            {'gzip', 'deflate'}
+        )
+
+
+class StylesheetTests(SimpleTestCase):
+    def test_bootstrap_is_loaded_once(self):
+        """Bootstrap подключается один раз и не с CDN."""
+        response = self.client.get(reverse('about:author'))
+        self.assertContains(response, 'bootstrap.min.css', count=1)
+        self.assertNotContains(response, 'bootstrapcdn')
@@ -1,4 +1,9 @@
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from . import media
+from .metrics import get_buffer
 
 
 def page_not_found(request, exception):
@@ -11,3 +16,16 @@ def csrf_failure(request, reason=''):
         {'path': request.path},
         status=403
     )
+
+
+def request_metrics(request):
+    """Последние измерения RequestMetricsMiddleware этого процесса."""
+    if not request.user.is_staff:
+        raise Http404
+    return JsonResponse({'requests': list(get_buffer())})
+
+
+@require_safe
+def serve_media(request, name):
+    """Загруженные файлы: картинки постов и миниатюры (см. ``media``)."""
+    return media.serve(request, name)
@@ -1,6 +1,18 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, PostRevision
+
+
+class PostRevisionInline(admin.TabularInline):
+    """Прежние тексты поста только для просмотра."""
+    model = PostRevision
+    fields = ('version', 'pub_date', 'text')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -8,9 +20,12 @@ class PostAdmin(admin.ModelAdmin):
         'pk',
         'text',
         'pub_date',
+        'updated_at',
+        'version',
         'author',
         'group',
     )
+    inlines = (PostRevisionInline,)
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
@@ -0,0 +1,335 @@
+import hashlib
+import time
+
+from functools import wraps
+
+from core.metrics import record_cache
+from core.routers import primary
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template import engines
+from django.template.loader import get_template
+from django.template.utils import InvalidTemplateEngineError
+from django.utils.cache import (
+    get_cache_key, get_conditional_response, has_vary_header, learn_cache_key,
+    patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date
+from django.utils.safestring import mark_safe
+
+from . import holes
+
+CARD_TEMPLATE = 'includes/post_card.html'
+EDIT_MARKER = '<!-- post-edit -->'
+# Ожидание чужой сборки страницы, секунды
+LOCK_WAIT = 1
+LOCK_POLL = 0.05
+
+
+def version_key(*parts):
+    return 'version:' + ':'.join(str(part) for part in parts)
+
+
+def version_seed():
+    """Начальная версия ключа.
+
+    Берётся от времени, чтобы версия, вытесненная из кэша, не вернулась
+    к значению, под которым ещё лежат старые фрагменты.
+    """
+    return int(time.time() * 1000)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        seed = version_seed()
+        for key in missing:
+            cache.add(key, seed, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_version(*parts):
+    """Сменить версию сейчас и ещё раз после фиксации транзакции.
+
+    Первая смена сразу прекращает отдачу страниц старой версии. Но запрос,
+    пришедший до фиксации, соберёт страницу по ещё старым данным и положит
+    её под новую версию; вторая смена после фиксации делает такую страницу
+    недоступной.
+    """
+    increment_version(*parts)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: increment_version(*parts))
+
+
+def increment_version(*parts):
+    """Сменить версию, после чего все ключи со старой версией не читаются."""
+    key = version_key(*parts)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, version_seed(), timeout=None):
+            cache.incr(key)
+
+
+def post_version_keys(post):
+    """Версии автора и группы поста; свою версию пост хранит в строке."""
+    return [
+        version_key('user', post.author_id),
+        version_key('group', post.group_id),
+    ]
+
+
+def card_template(name):
+    """Шаблон карточки из Jinja2, если он подключён, иначе из Django."""
+    try:
+        engine = engines['jinja2']
+    except InvalidTemplateEngineError:
+        return get_template(name)
+    return engine.get_template(name)
+
+
+def render_cards(posts, request, template=CARD_TEMPLATE):
+    """HTML карточек постов из кэша фрагментов.
+
+    Карточка хранится под ключом из id и ``version`` поста и версий автора
+    и группы, поэтому её переиспользуют все ленты. На одну страницу уходит два
+    запроса к кэшу: за версиями и за фрагментами. Недостающие карточки
+    рисуются одним заранее загруженным шаблоном. Кнопка редактирования
+    вставляется в готовый фрагмент по маркеру ``EDIT_MARKER``.
+    """
+    posts = list(posts)
+    version_keys = [post_version_keys(post) for post in posts]
+    versions = dict(zip(
+        sum(version_keys, []), get_versions(sum(version_keys, []))
+    ))
+    card_keys = [
+        'post_card:{}:{}:{}.{}'.format(
+            template, post.pk, post.version,
+            '.'.join(str(versions[key]) for key in keys)
+        )
+        for post, keys in zip(posts, version_keys)
+    ]
+    cards = cache.get_many(card_keys)
+    missing = {}
+    compiled = None
+    for post, key in zip(posts, card_keys):
+        if key not in cards:
+            compiled = compiled or card_template(template)
+            missing[key] = compiled.render({'post': post})
+    if missing:
+        cache.set_many(missing, settings.CACHES_TIME_FRAGMENTS)
+        cards.update(missing)
+    return [
+        personalize_card(cards[key], post, request)
+        for post, key in zip(posts, card_keys)
+    ]
+
+
+def personalize_card(card, post, request):
+    edit_link = holes.render(request, 'post_edit', post.pk, post.author_id)
+    return mark_safe(card.replace(EDIT_MARKER, edit_link))
+
+
+def feed_cache_key(*parts):
+    """Ключ кэша списка id для ленты; зависит от её текущей версии."""
+    version, = get_versions([version_key('feed', *parts)])
+    return 'feed_ids:{}:{}'.format(':'.join(map(str, parts)), version)
+
+
+def position_cache_key(feed_key, key_values, backwards):
+    position = repr((key_values, backwards)).encode()
+    return '{}:{}'.format(feed_key, hashlib.md5(position).hexdigest())
+
+
+def page_version_keys(version_parts):
+    return [version_key('page', 'all')] + [
+        version_key('page', *parts) for parts in version_parts
+    ]
+
+
+def page_cache_prefix(key_prefix, version_parts):
+    keys = page_version_keys(version_parts)
+    return '{}.{}'.format(
+        key_prefix, '.'.join(str(version) for version in get_versions(keys))
+    )
+
+
+def wait_for_page(cache_key, prefix):
+    """Подождать страницу, которую собирает другой процесс."""
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(cache_key)
+        if entry is not None and entry['prefix'] == prefix:
+            return entry['response']
+    return None
+
+
+def read_page(cache_key, prefix):
+    """Страница из кэша или ``None`` и признак взятой блокировки пересборки."""
+    entry = cache.get(cache_key)
+    if entry is not None and entry['prefix'] == prefix and (
+        entry['fresh_until'] > time.time()
+    ):
+        record_cache('hit')
+        return entry['response'], False
+    if cache.add(cache_key + '.lock', 1, settings.CACHES_LOCK_TIMEOUT):
+        return None, True
+    if entry is not None:
+        record_cache('stale')
+        return entry['response'], False
+    response = wait_for_page(cache_key, prefix)
+    if response is not None:
+        record_cache('hit')
+    return response, False
+
+
+def cache_page_versioned(timeout, key_prefix, versions):
+    """Кэш страницы, привязанный к версиям из ``versions``.
+
+    ``versions`` получает аргументы представления и возвращает кортежи
+    частей версий, например ``[('group', slug)]``. Сигналы меняют версии при
+    записи, поэтому страница остаётся свежей при длинном ``timeout``.
+
+    В кэше лежит скелет страницы без личных фрагментов (см. ``holes``),
+    один для всех пользователей: ключ не зависит от cookie. Фрагменты
+    вставляются в каждый ответ, а сам ответ получает ``Vary: Cookie``.
+
+    Защита от лавины запросов: страницу пересобирает только тот запрос,
+    который взял блокировку ``cache.add``. Остальные в это время получают
+    прежнюю версию страницы (устаревшую по времени или по версии), а если
+    её нет, недолго ждут результата вместо параллельной сборки.
+
+    Скелет собирается по основной базе, а не по реплике: он ложится в кэш
+    под уже новыми версиями.
+
+    ``timeout`` — срок только для серверного кэша: браузер получает
+    заголовки ``patch_page_cache_control`` и перепроверяет страницу.
+    """
+    def decorator(view):
+        def skeleton(request, *args, **kwargs):
+            prefix = page_cache_prefix(key_prefix, versions(*args, **kwargs))
+            cache_key = get_cache_key(request, key_prefix, 'GET', cache=cache)
+            locked = False
+            if cache_key is not None:
+                response, locked = read_page(cache_key, prefix)
+                if response is not None:
+                    return response
+            record_cache('miss')
+            request.page_skeleton = True
+            try:
+                with primary():
+                    response = view(request, *args, **kwargs)
+                store_page(request, response, timeout, key_prefix, prefix)
+            finally:
+                request.page_skeleton = False
+                if locked:
+                    cache.delete(cache_key + '.lock')
+            return response
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            response = fill_page(request, skeleton(request, *args, **kwargs))
+            patch_page_cache_control(request, response)
+            return response
+        return wrapper
+    return decorator
+
+
+def store_page(request, response, timeout, key_prefix, prefix):
+    if response.status_code != 200 or response.streaming:
+        return
+    if has_vary_header(response, '*'):
+        return
+    lifetime = timeout + settings.CACHES_TIME_STALE
+    cache_key = learn_cache_key(
+        request, response, lifetime, key_prefix, cache=cache
+    )
+    cache.set(
+        cache_key,
+        {
+            'prefix': prefix,
+            'response': response,
+            'fresh_until': time.time() + timeout,
+        },
+        lifetime
+    )
+
+
+def fill_page(request, response):
+    """Вставить в скелет страницы фрагменты пользователя запроса."""
+    if not response.streaming:
+        response.content = holes.fill(
+            response.content.decode(response.charset), request
+        )
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def page_etag(request, keys, last_modified=None):
+    """Слабый ETag страницы из версий ``keys``, времени изменения
+    с микросекундами, адреса и пользователя.
+
+    Слабый, потому что маскированный CSRF-токен в формах меняется
+    с каждым ответом, хотя страница та же.
+    """
+    state = repr((
+        request.get_full_path(), request.user.pk, get_versions(keys),
+        last_modified and last_modified.isoformat(),
+    ))
+    return 'W/"{}"'.format(hashlib.md5(state.encode()).hexdigest())
+
+
+def patch_page_cache_control(request, response):
+    """Анонимную страницу может держать общий прокси, личную — никто.
+
+    Браузер в обоих случаях перепроверяет страницу по ETag.
+    """
+    patch_vary_headers(response, ('Cookie',))
+    if response.has_header('Expires'):
+        del response['Expires']
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True, max_age=0)
+    else:
+        patch_cache_control(
+            response,
+            public=True,
+            max_age=0,
+            s_maxage=settings.CACHES_TIME_PROXY,
+        )
+
+
+def conditional_page(validators):
+    """Ответ 304 по ``ETag`` и ``Last-Modified`` до сборки страницы.
+
+    ``validators`` получает аргументы представления и возвращает ключи
+    версий, от которых зависит страница, и время последнего изменения
+    (или ``None``) — одним дешёвым запросом по индексу.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            keys, last_modified = validators(*args, **kwargs)
+            etag = page_etag(request, keys, last_modified)
+            timestamp = last_modified and int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_page_cache_control(request, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+
+def count_of(queryset, field):
+    """Подзапрос ``COUNT(*)`` строк ``queryset``, где ``field`` = pk."""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counts, output_field=IntegerField()),
+        Value(0)
+    )
+
+
+def counter_sources():
+    """Хранимые счётчики и выражения, по которым они пересчитываются."""
+    return (
+        (Post, 'comments_count', count_of(Comment.objects, 'post')),
+        (Group, 'posts_count', count_of(Post.objects, 'group')),
+        (UserCounters, 'posts_count', count_of(Post.objects, 'author')),
+        (UserCounters, 'comments_count', count_of(Comment.objects, 'author')),
+        (UserCounters, 'followers_count', count_of(Follow.objects, 'author')),
+    )
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно сдвинуть счётчик ``field`` на ``delta`` без ухода в минус."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id, field, delta):
+    updated = change_counter(
+        UserCounters.objects.filter(pk=user_id), field, delta
+    )
+    if not updated and delta > 0:
+        recount_user(user_id)
+
+
+def recount_user(user_id):
+    counters, _ = UserCounters.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'comments_count': Comment.objects.filter(
+                author_id=user_id
+            ).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+        }
+    )
+    return counters
+
+
+def get_user_counters(user):
+    """Счётчики пользователя; строка создаётся при первом обращении."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return recount_user(user.pk)
+
+
+@transaction.atomic
+def rebuild_counters():
+    """Пересчитать все счётчики по постам, комментариям и подпискам."""
+    missing = User.objects.filter(counters__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserCounters.objects.bulk_create(
+        [UserCounters(user_id=pk) for pk in missing],
+        ignore_conflicts=True
+    )
+    for model, field, expected in counter_sources():
+        model.objects.update(**{field: expected})
+
+
+def check_counters():
+    """Число расходящихся строк для каждого счётчика вида ``Model.field``."""
+    mismatches = {
+        'UserCounters.user': User.objects.filter(
+            counters__isnull=True
+        ).count()
+    }
+    for model, field, expected in counter_sources():
+        mismatches[f'{model.__name__}.{field}'] = model.objects.annotate(
+            expected=expected
+        ).exclude(**{field: F('expected')}).count()
+    return mismatches
+
+
+def table_estimate(model):
+    """Число строк таблицы по статистике базы или ``None``, если её нет.
+
+    Оценка есть только на PostgreSQL: ``pg_class.reltuples`` обновляет
+    autovacuum. ``sqlite_stat1`` меняется лишь при ``ANALYZE``, который
+    дороже ``COUNT(*)``, поэтому на SQLite строки считаются.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or not row[0] or row[0] <= 0:
+        return None
+    return int(row[0])
+
+
+def cached_count(key, compute):
+    """``compute()`` из кэша на ``CACHES_TIME_COUNTS`` секунд."""
+    key = 'count:' + key
+    count = cache.get(key)
+    if count is None:
+        count = compute()
+        cache.set(key, count, settings.CACHES_TIME_COUNTS)
+    return count
+
+
+def approximate_count(model):
+    """Примерное число строк таблицы без ``COUNT(*)`` на каждый запрос."""
+    def compute():
+        estimate = table_estimate(model)
+        return model.objects.count() if estimate is None else estimate
+    return cached_count(model._meta.label_lower, compute)
+
+
+def refresh_statistics():
+    """Обновить статистику планировщика после массовой записи."""
+    if connection.vendor in ('sqlite', 'postgresql'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Comment, Post
+from .uploads import file_too_large, invalid_image_message, prepare_image
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +10,25 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def __init__(self, *args, oversized_upload=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oversized_upload = oversized_upload
+        self.fields['image'].error_messages['invalid_image'] = (
+            invalid_image_message()
+        )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.oversized_upload in self.fields:
+            self.add_error(self.oversized_upload, file_too_large())
+        return cleaned_data
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return prepare_image(image)
+        return image
+
     def clean_subject(self):
         data = self.cleaned_data['subject']
 
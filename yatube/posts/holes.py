@@ -0,0 +1,100 @@
+"""Личные фрагменты страниц поверх общего кэша («дыры»).
+
+Страница кэшируется одна на всех как скелет: всё, что зависит от
+пользователя, в нём заменено маркером ``<!-- hole:имя:аргументы -->``.
+При каждом ответе маркеры заменяются фрагментами для текущего
+пользователя, поэтому анонимы и авторизованные читают один и тот же кэш.
+Фрагменты маленькие и почти не ходят в базу: меню пользователя,
+кнопка подписки, ссылка редактирования и форма комментария.
+"""
+import re
+
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .forms import CommentForm
+from .models import Follow
+
+HOLE_RE = re.compile(r'<!-- hole:(\w+)((?::[\w.@+-]*)*) -->')
+
+HOLES = {}
+
+
+def hole(fragment):
+    """Зарегистрировать ``fragment(request, *args)`` под его именем."""
+    HOLES[fragment.__name__] = fragment
+    return fragment
+
+
+def marker(name, *args):
+    return mark_safe('<!-- hole:{} -->'.format(
+        ':'.join([name, *(str(arg) for arg in args)])
+    ))
+
+
+def render(request, name, *args):
+    """Фрагмент для пользователя запроса или маркер, если собирается скелет."""
+    if getattr(request, 'page_skeleton', False):
+        return marker(name, *args)
+    return mark_safe(HOLES[name](request, *args))
+
+
+def fill(content, request):
+    """Заменить маркеры скелета фрагментами для пользователя запроса."""
+    return HOLE_RE.sub(
+        lambda match: HOLES[match.group(1)](
+            request, *match.group(2).split(':')[1:]
+        ),
+        content
+    )
+
+
+@hole
+def user_menu(request):
+    return render_to_string('includes/user_menu.html', request=request)
+
+
+@hole
+def feed_switcher(request):
+    return render_to_string('posts/includes/switcher.html', request=request)
+
+
+@hole
+def follow_button(request, author_id, username):
+    author_id = int(author_id)
+    user = request.user
+    if not user.is_authenticated or user.pk == author_id:
+        return ''
+    return render_to_string(
+        'posts/includes/follow_unfollow.html',
+        {
+            'author': {'id': author_id, 'username': username},
+            'following': Follow.objects.filter(
+                user=user, author_id=author_id
+            ).exists(),
+        },
+        request=request
+    )
+
+
+@hole
+def post_edit(request, post_id, author_id):
+    if request.user.pk != int(author_id):
+        return ''
+    return format_html(
+        '<a class="btn btn-primary" href="{}">редактировать пост</a>',
+        reverse('posts:post_edit', args=[post_id])
+    )
+
+
+@hole
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'includes/create_comment_form.html',
+        {'post_id': post_id, 'form': CommentForm()},
+        request=request
+    )
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+from posts.transfer import export_records, open_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON; файл с расширением .gz сжимается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию стандартный вывод.',
+        )
+        parser.add_argument(
+            '--media-dir',
+            help='Каталог, куда скопировать картинки постов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            export_records(sys.stdout, options['media_dir'])
+            return
+        with open_ndjson(options['output'], 'w') as output:
+            counts = export_records(output, options['media_dir'])
+        self.stdout.write(self.style.SUCCESS('Выгружено: {}.'.format(
+            ', '.join(f'{name} {count}' for name, count in counts.items())
+        )))
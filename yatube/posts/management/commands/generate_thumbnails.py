@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для постов, у которых их ещё нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать миниатюры всех постов с картинками.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(thumbnail='')
+        generated = 0
+        for post_id in posts.values_list('pk', flat=True).iterator():
+            generate_thumbnails(post_id)
+            generated += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано постов: {generated}.')
+        )
@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from posts.transfer import BATCH_SIZE, ImportConflict, Importer, open_ndjson
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts. Прерванную загрузку можно '
+        'продолжить с --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON или NDJSON.gz.')
+        parser.add_argument(
+            '--media-dir',
+            help='Каталог с картинками постов из export_posts --media-dir.',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Пропустить строки, загруженные прошлым запуском.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['input']
+        progress_path = path + '.progress'
+        skip = 0
+        if options['resume'] and os.path.exists(progress_path):
+            with open(progress_path) as progress:
+                skip = int(progress.read() or 0)
+
+        def save_progress(line_number):
+            with open(progress_path, 'w') as progress:
+                progress.write(str(line_number))
+
+        importer = Importer(
+            batch_size=options['batch_size'],
+            media_dir=options['media_dir'],
+            on_progress=save_progress,
+        )
+        started = time.perf_counter()
+        try:
+            with open_ndjson(path, 'r') as lines:
+                counts = importer.load(lines, skip=skip)
+        except ImportConflict as error:
+            raise CommandError(
+                f'Загрузка остановлена: {error}. Посты и комментарии '
+                f'загружаются с id из файла, поэтому база не должна '
+                f'содержать других записей с этими id.'
+            )
+        except (DatabaseError, OSError, ValueError, KeyError) as error:
+            raise CommandError(
+                f'Загрузка остановлена: {error!r}. '
+                f'Продолжить можно с --resume.'
+            )
+        importer.finish(everything=bool(skip))
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} в секунду).'
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from posts.counters import check_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимые счётчики постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счётчики, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rebuild_counters()
+        mismatches = {
+            name: rows for name, rows in check_counters().items() if rows
+        }
+        for name, rows in mismatches.items():
+            self.stderr.write(f'{name}: расходится строк: {rows}')
+        if mismatches:
+            raise CommandError('Счётчики не совпадают с данными.')
+        self.stdout.write(self.style.SUCCESS('Счётчики в порядке.'))
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+CREATE_SQL = (
+    'CREATE VIRTUAL TABLE posts_search '
+    'USING fts5(text, group_title, author_name)'
+)
+FILL_SQL = (
+    'INSERT INTO posts_search (rowid, text, group_title, author_name) '
+    'SELECT p.id, p.text, COALESCE(g.title, \'\'), '
+    'u.username || \' \' || u.first_name || \' \' || u.last_name '
+    'FROM posts_post p '
+    'JOIN auth_user u ON u.id = p.author_id '
+    'LEFT JOIN posts_group g ON g.id = p.group_id'
+)
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(FILL_SQL)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def fill_updated_at(apps, schema_editor):
+    """Ещё не правленые посты и комментарии изменены в момент публикации."""
+    for model_name in ('Post', 'Comment'):
+        apps.get_model('posts', model_name).objects.update(
+            updated_at=F('pub_date')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='date_of_update'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='version'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='date_of_update'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='version'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='date_of_update'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='version'),
+        ),
+        migrations.CreateModel(
+            name='PostRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='date_of_pub')),
+                ('version', models.PositiveIntegerField(verbose_name='version')),
+                ('text', models.TextField(verbose_name='post_text')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='posts.Post', verbose_name='post')),
+            ],
+            options={
+                'verbose_name': 'Ревизия поста',
+                'verbose_name_plural': 'Ревизии постов',
+                'ordering': ('-version',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postrevision',
+            constraint=models.UniqueConstraint(fields=('post', 'version'), name='unique_post_revision'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+CREATE_SQL = (
+    'CREATE TABLE posts_search ('
+    'post_id integer PRIMARY KEY '
+    'REFERENCES posts_post (id) ON DELETE CASCADE, '
+    'document tsvector NOT NULL)'
+)
+INDEX_SQL = (
+    'CREATE INDEX posts_search_document_idx '
+    'ON posts_search USING GIN (document)'
+)
+FILL_SQL = (
+    'INSERT INTO posts_search (post_id, document) '
+    'SELECT p.id, '
+    'setweight(to_tsvector(\'simple\', p.text), \'B\') || '
+    'setweight(to_tsvector(\'simple\', COALESCE(g.title, \'\') || \' \' || '
+    'u.username || \' \' || u.first_name || \' \' || u.last_name), \'A\') '
+    'FROM posts_post p '
+    'JOIN auth_user u ON u.id = p.author_id '
+    'LEFT JOIN posts_group g ON g.id = p.group_id'
+)
+
+
+def create_search_table(apps, schema_editor):
+    """Индекс поиска для PostgreSQL; на SQLite его создала 0013_search."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(FILL_SQL)
+    schema_editor.execute(INDEX_SQL)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -1,4 +1,4 @@
-from core.models import PubdateModel
+from core.models import PubdateModel, VersionedModel
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
@@ -6,7 +6,7 @@ from django.db import models
 User = get_user_model()
 
 
-class Group(models.Model):
+class Group(VersionedModel):
     title = models.CharField(max_length=200, verbose_name='group_title',)
     description = models.TextField(verbose_name='group_description',)
     slug = models.SlugField(
@@ -15,12 +15,38 @@ class Group(models.Model):
         unique=True,
         verbose_name='group_slug',
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='posts_count',
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(PubdateModel):
+FEED_FIELDS = (
+    'text', 'pub_date', 'updated_at', 'version', 'image', 'thumbnail',
+    'comments_count',
+    'author', 'author__username', 'author__first_name', 'author__last_name',
+    'group', 'group__slug', 'group__title',
+)
+# Поля, по которым строятся курсор и валидаторы кэша ленты
+KEY_FIELDS = ('pub_date', 'updated_at', 'version', 'author', 'group')
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа в том же запросе, лишние поля
+        не загружаются. Число комментариев хранится в ``comments_count``."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+    def keys_only(self):
+        """Посты без текста и связей: для курсора, ETag и Last-Modified."""
+        return self.only(*KEY_FIELDS)
+
+
+class Post(PubdateModel, VersionedModel):
     text = models.TextField(
         verbose_name='post_text',
         help_text='Введите текст поста'
@@ -45,17 +71,74 @@ class Post(PubdateModel):
         upload_to='posts/',
         blank=True
     )
+    thumbnail = models.CharField(
+        'Миниатюра',
+        max_length=255,
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='comments_count'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.ITEMS_PER_PAGE]
 
 
-class Comment(PubdateModel):
+class PostRevision(PubdateModel):
+    """Прежний текст поста. Записи только добавляются.
+
+    ``version`` — номер версии поста, у которой был этот текст,
+    ``pub_date`` — когда его заменили.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='revisions',
+        verbose_name='post'
+    )
+    version = models.PositiveIntegerField(verbose_name='version')
+    text = models.TextField(verbose_name='post_text')
+
+    class Meta:
+        ordering = ('-version',)
+        verbose_name = 'Ревизия поста'
+        verbose_name_plural = 'Ревизии постов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'version'],
+                name='unique_post_revision'
+            ),
+        ]
+
+    def __str__(self):
+        return self.text[:settings.ITEMS_PER_PAGE]
+
+
+class Comment(PubdateModel, VersionedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -76,6 +159,12 @@ class Comment(PubdateModel):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date', 'id'],
+                name='comment_post_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.ITEMS_PER_PAGE]
@@ -108,3 +197,91 @@ class Follow(models.Model):
                     author__gt=models.F('user')), name='dont subsctibe yself'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='follow_user_author_idx'
+            ),
+        ]
+
+
+class UserCounters(models.Model):
+    """Счётчики постов и комментариев пользователя.
+
+    Обновляются сигналами из ``posts.signals`` при каждой записи, поэтому
+    страницы читают их одним запросом вместо ``COUNT`` по таблицам.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='user'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='posts_count'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='comments_count'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='followers_count'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}/{self.comments_count}'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому лента
+    ``follow_index`` читается одним диапазоном по индексу
+    ``(user, pub_date)``. ``pub_date`` и ``author`` скопированы из поста.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='user'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='post'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='author'
+    )
+    pub_date = models.DateTimeField(verbose_name='date_of_pub')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline entry unique'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+        ]
@@ -0,0 +1,186 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.db import connection
+
+from .models import Group, Post
+
+User = get_user_model()
+
+SEARCH_TABLE = 'posts_search'
+# Веса столбцов для bm25: совпадение в названии группы или имени автора
+# весит больше, чем в длинном тексте поста.
+RANK = f'bm25({SEARCH_TABLE}, 1.0, 2.0, 2.0)'
+# На PostgreSQL текст поста получает вес B, группа и автор — A; веса
+# ts_rank для D, C, B, A дают то же соотношение 1:2, что и bm25 выше.
+PG_CONFIG = 'simple'
+PG_WEIGHTS = '{0.1, 0.2, 0.5, 1.0}'
+PG_DOCUMENT = (
+    f"setweight(to_tsvector('{PG_CONFIG}', text), 'B') || "
+    f"setweight(to_tsvector('{PG_CONFIG}', group_title || ' ' || "
+    f"author_name), 'A')"
+)
+# Для каждой базы: столбец с id поста, источник строк с условием
+# совпадения (один параметр — выражение запроса) и порядок по релевантности
+SEARCH_SQL = {
+    'sqlite': {
+        'key': 'rowid',
+        'match': f'{SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s',
+        'rank': RANK,
+    },
+    'postgresql': {
+        'key': 'post_id',
+        'match': (
+            f"{SEARCH_TABLE}, to_tsquery('{PG_CONFIG}', %s) query "
+            f'WHERE document @@ query'
+        ),
+        'rank': f"ts_rank('{PG_WEIGHTS}', document, query) DESC",
+    },
+}
+WORD_RE = re.compile(r'\w+')
+
+
+def fts_enabled():
+    """Есть ли для текущей базы полнотекстовый индекс ``posts_search``."""
+    return connection.vendor in SEARCH_SQL
+
+
+@checks.register(checks.Tags.database)
+def check_search_index(app_configs, **kwargs):
+    if fts_enabled():
+        return []
+    return [checks.Warning(
+        f'Для базы {connection.vendor} нет полнотекстового индекса: '
+        f'поиск по ?q= всегда пуст.',
+        id='posts.W001',
+    )]
+
+
+def index_source_sql():
+    """``SELECT`` строк индекса из постов, групп и пользователей."""
+    qn = connection.ops.quote_name
+    post, group, user = (
+        qn(model._meta.db_table) for model in (Post, Group, User)
+    )
+    return (
+        f'SELECT p.id, p.text, COALESCE(g.title, \'\'), '
+        f'u.username || \' \' || u.first_name || \' \' || u.last_name '
+        f'FROM {post} p '
+        f'JOIN {user} u ON u.id = p.author_id '
+        f'LEFT JOIN {group} g ON g.id = p.group_id'
+    )
+
+
+def reindex(where='', params=()):
+    """Переписать строки индекса для постов, подходящих под ``where``."""
+    if not fts_enabled():
+        return
+    if connection.vendor == 'postgresql':
+        sql = (
+            f'INSERT INTO {SEARCH_TABLE} (post_id, document) '
+            f'SELECT id, {PG_DOCUMENT} '
+            f'FROM ({index_source_sql()} {where}) '
+            f'source (id, text, group_title, author_name) '
+            f'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document'
+        )
+    else:
+        sql = (
+            f'INSERT OR REPLACE INTO {SEARCH_TABLE} '
+            f'(rowid, text, group_title, author_name) '
+            f'{index_source_sql()} {where}'
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def index_post(post_id):
+    reindex('WHERE p.id = %s', [post_id])
+
+
+def index_group(group_id):
+    reindex('WHERE p.group_id = %s', [group_id])
+
+
+def index_author(author_id):
+    reindex('WHERE p.author_id = %s', [author_id])
+
+
+def unindex_post(post_id):
+    if not fts_enabled():
+        return
+    key = SEARCH_SQL[connection.vendor]['key']
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE {key} = %s', [post_id]
+        )
+
+
+def rebuild_index():
+    if not fts_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    reindex()
+
+
+def match_expression(query, vendor='sqlite'):
+    """Запрос пользователя как выражение индекса: все слова, по префиксу.
+
+    Во вводе остаются только слова, поэтому операторы FTS5 и ``tsquery``
+    не интерпретируются.
+    """
+    words = WORD_RE.findall(query)
+    if vendor == 'postgresql':
+        return ' & '.join(f"'{word}':*" for word in words)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+class SearchResults:
+    """Ленивый список найденных постов, упорядоченных по bm25.
+
+    Поддерживает ``count()`` и срезы, поэтому подходит для ``Paginator``:
+    в базу уходят только ``COUNT`` по индексу и ``LIMIT/OFFSET`` по нему же.
+    """
+
+    def __init__(self, query):
+        self.sql = SEARCH_SQL.get(connection.vendor)
+        self.match = self.sql and match_expression(query, connection.vendor)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {self.sql["match"]}', [self.match]
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if not self.match or index.stop is None or index.stop <= start:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {self.sql["key"]} FROM {self.sql["match"]} '
+                f'ORDER BY {self.sql["rank"]} LIMIT %s OFFSET %s',
+                [self.match, index.stop - start, start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    """Посты по запросу из строки поиска в шапке сайта.
+
+    Поиск идёт только по индексу ``posts_search``: FTS5 на SQLite,
+    ``tsvector`` с GIN-индексом на PostgreSQL. На других базах индекса нет,
+    и результаты пусты, а не полный просмотр таблицы через ``LIKE``.
+    """
+    return SearchResults(query)
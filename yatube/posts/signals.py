@@ -0,0 +1,154 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search, thumbnails, timeline
+from .cache import bump_version
+from .counters import change_counter, change_user_counter
+from .models import Comment, Follow, Group, Post, PostRevision, User
+
+NAME_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw, **kwargs):
+    instance._saved_group_id, instance._saved_image = None, ''
+    instance._saved_text, instance._saved_version = None, None
+    if raw or instance._state.adding:
+        return
+    saved = sender.objects.filter(pk=instance.pk).values_list(
+        'group_id', 'image', 'text', 'version'
+    ).first()
+    if saved is not None:
+        (
+            instance._saved_group_id, instance._saved_image,
+            instance._saved_text, instance._saved_version,
+        ) = saved
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    search.index_post(instance.pk)
+    if instance._saved_text not in (None, instance.text):
+        PostRevision.objects.create(
+            post_id=instance.pk,
+            version=instance._saved_version,
+            text=instance._saved_text,
+        )
+    bump_pages(instance.author_id, instance.group_id, instance._saved_group_id)
+    if (instance.image.name or '') != (instance._saved_image or ''):
+        thumbnails.schedule_thumbnails(instance.pk)
+    if created:
+        change_user_counter(instance.author_id, 'posts_count', 1)
+        change_group_counter(instance.group_id, 1)
+        timeline.push_post(instance)
+        bump_feeds(instance)
+    elif instance._saved_group_id != instance.group_id:
+        change_group_counter(instance._saved_group_id, -1)
+        change_group_counter(instance.group_id, 1)
+        bump_version('feed', 'group', instance._saved_group_id)
+        bump_version('feed', 'group', instance.group_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'posts_count', -1)
+    change_group_counter(instance.group_id, -1)
+    search.unindex_post(instance.pk)
+    bump_feeds(instance)
+    bump_pages(instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw, **kwargs):
+    if not (raw or created):
+        search.index_group(instance.pk)
+        bump_version('group', instance.pk)
+        bump_version('page', 'all')
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump_version('page', 'all')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    if raw or created:
+        return
+    if update_fields is None or NAME_FIELDS & set(update_fields):
+        search.index_author(instance.pk)
+        bump_version('user', instance.pk)
+        bump_version('page', 'all')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        change_user_counter(instance.author_id, 'comments_count', 1)
+        change_counter(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1
+        )
+    bump_version('comments', instance.post_id)
+    bump_version('page', 'post', instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'comments_count', -1)
+    change_counter(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', -1
+    )
+    bump_version('comments', instance.post_id)
+    bump_version('page', 'post', instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if raw or not created:
+        return
+    change_user_counter(instance.author_id, 'followers_count', 1)
+    timeline.pull_author(instance.user_id, instance.author_id)
+    bump_pages(instance.author_id, index=False)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'followers_count', -1)
+    timeline.drop_author(instance.user_id, instance.author_id)
+    timeline.backfill_author(instance.author_id)
+    bump_pages(instance.author_id, index=False)
+
+
+def bump_feeds(post):
+    """Сбросить кэш списков id для лент, где показывается пост."""
+    bump_version('feed', 'index')
+    bump_version('feed', 'author', post.author_id)
+    if post.group_id is not None:
+        bump_version('feed', 'group', post.group_id)
+
+
+def bump_pages(author_id, *group_ids, index=True):
+    """Сбросить кэш страниц, на которых виден пост или кнопка подписки."""
+    if index:
+        bump_version('page', 'index')
+    usernames = User.objects.filter(pk=author_id).values_list(
+        'username', flat=True
+    )
+    for username in usernames:
+        bump_version('page', 'author', username)
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    )
+    for slug in slugs:
+        bump_version('page', 'group', slug)
+
+
+def change_group_counter(group_id, delta):
+    if group_id is not None:
+        change_counter(
+            Group.objects.filter(pk=group_id), 'posts_count', delta
+        )
@@ -0,0 +1,11 @@
+from django import template
+
+from .. import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Личный фрагмент страницы или его маркер в скелете для кэша."""
+    return holes.render(context['request'], name, *args)
@@ -0,0 +1,16 @@
+from django import template
+
+from ..cache import CARD_TEMPLATE, render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, template_name=CARD_TEMPLATE):
+    """Список HTML-карточек постов страницы из кэша фрагментов."""
+    return render_cards(posts, context['request'], template_name)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, template_name=CARD_TEMPLATE):
+    return render_cards([post], context['request'], template_name)[0]
@@ -1,13 +1,27 @@
+import shutil
+import tempfile
+
 from http import HTTPStatus
+from io import BytesIO, StringIO
 
+from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Comment, Group, Post, User
 
 
+def image_file(size, name='photo.jpg', image_format='JPEG', **options):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -15,6 +29,9 @@ class PostFormTests(TestCase):
         cls.user = User.objects.create(username='auth')
 
     def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.media_override.enable()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -32,6 +49,10 @@ class PostFormTests(TestCase):
             content_type='image/gif'
         )
 
+    def tearDown(self):
+        self.media_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
     def test_create_post(self):
         """Валидная форма создает запись в Post."""
         self.post = Post.objects.create(
@@ -57,6 +78,21 @@ class PostFormTests(TestCase):
         self.assertEqual(Post.objects.first().group, self.post.group)
         self.assertEqual(Post.objects.first().text, self.post.text)
 
+    def test_generate_thumbnails_command(self):
+        """Команда создаёт миниатюры и сохраняет URL в посте."""
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=self.uploaded
+        )
+        call_command('generate_thumbnails', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail.startswith(settings.MEDIA_URL))
+        cache.clear()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, f'src="{post.thumbnail}"')
+        cache.clear()
+
     def test_post_edit(self):
         """Валидная форма изменяет запись в Post."""
         self.group = Group.objects.create(
@@ -120,6 +156,92 @@ class PostFormTests(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
 
 
+@override_settings(
+    UPLOAD_IMAGE_MAX_SIDE=100, UPLOAD_IMAGE_MAX_PIXELS=40000,
+    UPLOAD_IMAGE_MAX_FULL_PIXELS=20000,
+)
+class PostImageUploadTests(TestCase):
+    def clean_image(self, image):
+        form = PostForm({'text': 'Картинка'}, {'image': image})
+        self.assertTrue(form.is_valid(), form.errors)
+        return Image.open(form.cleaned_data['image'])
+
+    def image_errors(self, image):
+        form = PostForm({'text': 'Картинка'}, {'image': image})
+        self.assertFalse(form.is_valid())
+        return form.errors['image']
+
+    def test_small_image_is_kept(self):
+        upload = image_file((80, 60), 'small.png', 'PNG')
+        image = self.clean_image(upload)
+        self.assertEqual((image.format, image.size), ('PNG', (80, 60)))
+
+    def test_large_image_is_downscaled(self):
+        image = self.clean_image(image_file((150, 90)))
+        self.assertEqual((image.format, image.size), ('JPEG', (100, 60)))
+
+    def test_exif_is_applied_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Телефон'
+        image = self.clean_image(image_file((40, 20), exif=exif.tobytes()))
+        self.assertEqual(image.size, (20, 40))
+        self.assertFalse(image.getexif())
+
+    def test_pixel_limit(self):
+        errors = self.image_errors(image_file((201, 200), 'big.png', 'PNG'))
+        self.assertIn('201×200', errors[0])
+
+    def test_full_decode_pixel_limit(self):
+        """PNG декодируется целиком, поэтому его лимит ниже, чем у JPEG."""
+        errors = self.image_errors(image_file((150, 150), 'big.png', 'PNG'))
+        self.assertIn('150×150', errors[0])
+        image = self.clean_image(image_file((150, 150)))
+        self.assertEqual((image.format, image.size), ('JPEG', (100, 100)))
+
+    def test_not_an_image(self):
+        upload = SimpleUploadedFile('fake.jpg', b'not an image', 'image/jpeg')
+        self.assertTrue(self.image_errors(upload))
+
+    @override_settings(
+        FILE_UPLOAD_MAX_MEMORY_SIZE=1024, UPLOAD_IMAGE_MAX_BYTES=4096
+    )
+    def test_byte_limit(self):
+        """Загрузка обрывается на лимите, а форма называет причину."""
+        user = User.objects.create(username='uploader')
+        self.client.force_login(user)
+        for data in (
+            {'text': 'Огромный', 'image': self.huge_file()},
+            {'image': self.huge_file(), 'text': 'Огромный'},
+        ):
+            with self.subTest(fields=list(data)):
+                response = self.client.post(
+                    reverse('posts:post_create'), data
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                errors = response.context['form'].errors.as_data()['image']
+                self.assertEqual(
+                    [error.code for error in errors], ['file_too_large']
+                )
+        self.assertFalse(Post.objects.filter(author=user).exists())
+
+    @override_settings(
+        FILE_UPLOAD_MAX_MEMORY_SIZE=1024, UPLOAD_IMAGE_MAX_BYTES=4096
+    )
+    def test_oversized_body_is_read_to_the_end(self):
+        """Тело дочитывается, чтобы клиент получил ответ, а не сброс."""
+        upload = SimpleUploadedFile('huge.jpg', bytes(1000000), 'image/jpeg')
+        request = RequestFactory().post(
+            '/', {'image': upload, 'text': 'Огромный'}
+        )
+        self.assertFalse(request.FILES)
+        self.assertEqual(request.oversized_upload, 'image')
+        self.assertEqual(len(request.META['wsgi.input']), 0)
+
+    def huge_file(self):
+        return SimpleUploadedFile('huge.jpg', bytes(10000), 'image/jpeg')
+
+
 class CommentFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
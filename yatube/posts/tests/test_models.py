@@ -1,8 +1,13 @@
+from io import StringIO
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 
-from ..models import Comment, Group, Post
+from ..counters import approximate_count, refresh_statistics, table_estimate
+from ..models import Comment, Group, Post, PostRevision, UserCounters
 
 User = get_user_model()
 
@@ -62,3 +67,122 @@ class CommentModelTest(TestCase):
         test_comment = self.comment
         expected_object_comment = test_comment.text[:settings.ITEMS_PER_PAGE]
         self.assertEqual(expected_object_comment, str(test_comment))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, posts, comments):
+        counters = UserCounters.objects.get(user=self.user)
+        self.assertEqual(
+            (counters.posts_count, counters.comments_count),
+            (posts, comments)
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании, переносе и удалении записей."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        self.assertCounters(posts=1, comments=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        comment.delete()
+        post.delete()
+        self.assertCounters(posts=0, comments=0)
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """rebuild_counters чинит счётчики, --check находит расхождения."""
+        Post.objects.bulk_create(
+            [Post(author=self.user, text=i, group=self.group)
+             for i in range(3)]
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--check', stderr=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', '--check', stdout=StringIO())
+        self.assertCounters(posts=3, comments=0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+
+    def test_approximate_count_is_cached(self):
+        """На SQLite число постов считается и держится в кэше."""
+        cache.clear()
+        Post.objects.bulk_create(
+            [Post(author=self.user, text=i) for i in range(3)]
+        )
+        refresh_statistics()
+        self.assertIsNone(table_estimate(Post))
+        Post.objects.create(author=self.user, text='Ещё пост')
+        self.assertEqual(approximate_count(Post), 4)
+        Post.objects.all().delete()
+        self.assertEqual(approximate_count(Post), 4)
+        cache.clear()
+        self.assertEqual(approximate_count(Post), 0)
+        cache.clear()
+
+
+class VersionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_every_save_bumps_version(self):
+        """Любое сохранение увеличивает version и сдвигает updated_at."""
+        post = Post.objects.create(author=self.user, text='Первый текст')
+        comment = Comment.objects.create(
+            post=post, author=self.user, text='Комментарий'
+        )
+        group = Group.objects.create(title='Группа', slug='group')
+        for instance in (post, comment, group):
+            with self.subTest(model=type(instance).__name__):
+                self.assertEqual(instance.version, 1)
+                updated_at = instance.updated_at
+                instance.save()
+                self.assertEqual(instance.version, 2)
+                self.assertGreater(instance.updated_at, updated_at)
+        post.save(update_fields=['thumbnail'])
+        post.refresh_from_db()
+        self.assertEqual(post.version, 3)
+
+    def test_edits_keep_previous_texts(self):
+        post = Post.objects.create(author=self.user, text='Первый текст')
+        post.text = 'Второй текст'
+        post.save()
+        post.save()
+        post.text = 'Третий текст'
+        post.save()
+        self.assertEqual(
+            list(post.revisions.values_list('version', 'text')),
+            [(3, 'Второй текст'), (1, 'Первый текст')]
+        )
+        self.assertEqual(PostRevision.objects.count(), 2)
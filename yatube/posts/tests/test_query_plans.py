@@ -0,0 +1,89 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+FULL_SCAN_TABLES = ('posts_', 'auth_user')
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(plan):
+    """Шаги плана, которые на больших таблицах станут медленными.
+
+    ``SCAN`` без индекса по таблицам приложения означает полный проход,
+    ``TEMP B-TREE`` — сортировку в памяти вместо чтения индекса по порядку.
+    """
+    problems = []
+    for step in plan:
+        if 'TEMP B-TREE' in step:
+            problems.append(step)
+        elif step.startswith('SCAN ') and 'INDEX' not in step and any(
+            table in step for table in FULL_SCAN_TABLES
+        ):
+            problems.append(step)
+    return problems
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTests(TestCase):
+    """Горячие запросы лент читают индексы, а не всю таблицу."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание группы',
+        )
+        for number in range(settings.ITEMS_PER_PAGE + 1):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.follower, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        self.client.force_login(self.follower)
+
+    def captured_queries(self, url):
+        """Запросы страницы и следующей за ней страницы ленты."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            page_obj = response.context.get('page_obj')
+            cursor = page_obj and page_obj.paginator.next_cursor
+            if cursor:
+                self.client.get(url, {'cursor': cursor})
+        return queries.captured_queries
+
+    def test_hot_paths_use_indexes(self):
+        """Ни один запрос лент не сканирует таблицу и не сортирует."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:post_comments', args=[self.post.pk]),
+        )
+        for url in urls:
+            for query in self.captured_queries(url):
+                with self.subTest(url=url, sql=query['sql']):
+                    plan = query_plan(query['sql'])
+                    self.assertEqual(plan_problems(plan), [], plan)
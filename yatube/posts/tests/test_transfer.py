@@ -0,0 +1,97 @@
+import os
+import tempfile
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..search import search_posts
+
+
+class TransferCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание группы',
+        )
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'posts.ndjson.gz')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def create_content(self):
+        posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        return posts
+
+    def export_and_clear(self):
+        call_command('export_posts', self.path, stdout=StringIO())
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+
+    def assertImported(self, posts):
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('pk', 'pub_date')),
+            [(post.pk, post.pub_date) for post in posts]
+        )
+        self.assertEqual(Comment.objects.get().post_id, posts[0].pk)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5
+        )
+        self.assertEqual(self.author.counters.posts_count, 5)
+        self.assertEqual(len(search_posts('Пост')), 5)
+
+    def test_export_and_import(self):
+        """Выгрузка загружается обратно с теми же id и датами."""
+        posts = self.create_content()
+        self.export_and_clear()
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertImported(posts)
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 5)
+
+    def test_import_resume(self):
+        """--resume пропускает строки, загруженные прошлым запуском."""
+        posts = self.create_content()
+        self.export_and_clear()
+        Group.objects.all().delete()
+        with open(self.path + '.progress', 'w') as progress:
+            progress.write(str(User.objects.count()))
+        call_command(
+            'import_posts', self.path, '--resume', '--batch-size=2',
+            stdout=StringIO()
+        )
+        self.assertFalse(os.path.exists(self.path + '.progress'))
+        self.assertTrue(Group.objects.filter(slug='test_group').exists())
+        self.assertImported(posts)
+
+    def test_import_stops_on_foreign_ids(self):
+        """Чужой пост с тем же id не подменяет пост из файла."""
+        posts = self.create_content()
+        self.export_and_clear()
+        local = Post.objects.create(
+            id=posts[0].pk, author=self.reader, text='Местный пост'
+        )
+        with self.assertRaises(CommandError):
+            call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(Post.objects.get(pk=local.pk).text, 'Местный пост')
+        self.assertFalse(Comment.objects.filter(post=local))
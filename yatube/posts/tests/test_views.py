@@ -1,11 +1,25 @@
+import time
+
+from datetime import timedelta
+from io import StringIO
+
+from core.testing import OnCommitMixin, QueryBudgetMixin
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.cache import get_cache_key
+from django.utils.http import http_date
 
-from ..models import Comment, Follow, Group, Post
+from ..cache import get_versions, version_key
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..search import match_expression
+from ..utils import WindowedPaginator
 
 User = get_user_model()
 
@@ -43,6 +57,73 @@ class PaginatorViewsTest(TestCase):
             response.context['page_obj']),
             settings.ITEMS_FOR_TEST - settings.ITEMS_PER_PAGE)
 
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсоры ведут на следующую страницу и обратно без OFFSET."""
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        first_page = self.client.get(url).context['page_obj']
+        next_cursor = first_page.paginator.next_cursor
+        self.assertEqual(len(first_page), settings.ITEMS_PER_PAGE)
+        self.assertIsNone(first_page.paginator.previous_cursor)
+
+        second_page = self.client.get(
+            url, {'cursor': next_cursor}
+        ).context['page_obj']
+        self.assertEqual(second_page.number, 2)
+        self.assertEqual(
+            len(second_page),
+            settings.ITEMS_FOR_TEST - settings.ITEMS_PER_PAGE
+        )
+        self.assertFalse(second_page.has_next())
+        first_ids = {post.pk for post in first_page}
+        self.assertFalse(first_ids & {post.pk for post in second_page})
+
+        back_page = self.client.get(
+            url, {'cursor': second_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(back_page.number, 1)
+        self.assertEqual(
+            [post.pk for post in back_page],
+            [post.pk for post in first_page]
+        )
+
+    def test_broken_cursor_gives_first_page(self):
+        """Подделанный курсор не ломает страницу."""
+        url = reverse('posts:profile', kwargs={'username': self.user.username})
+        response = self.client.get(url, {'cursor': 'broken'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(
+            len(response.context['page_obj']),
+            settings.ITEMS_PER_PAGE
+        )
+
+    def test_numbered_pages_use_estimated_count(self):
+        """Неточная оценка числа постов не ломает нумерованные страницы."""
+        posts = Post.objects.order_by('-pk')
+        per_page = settings.ITEMS_PER_PAGE
+        paginator = WindowedPaginator(posts, per_page, count=1)
+        first = paginator.get_page(1)
+        self.assertTrue(first.has_next())
+        self.assertEqual(paginator.num_pages, 2)
+        paginator = WindowedPaginator(posts, per_page, count=999)
+        self.assertFalse(paginator.get_page(2).has_next())
+        self.assertEqual(paginator.count, settings.ITEMS_FOR_TEST)
+        paginator = WindowedPaginator(posts, per_page, count=999)
+        self.assertEqual(paginator.get_page(50).number, 2)
+
+    @override_settings(PAGE_WINDOW=2)
+    def test_page_window(self):
+        """Навигация показывает только окно страниц вокруг текущей."""
+        paginator = WindowedPaginator(range(100), 1, count=100)
+        self.assertEqual(
+            list(paginator.get_page(50).window), [48, 49, 50, 51, 52]
+        )
+        self.assertEqual(list(paginator.get_page(1).window), [1, 2, 3])
+        self.assertEqual(list(paginator.get_page(100).window), [98, 99, 100])
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        cache.clear()
+        # «Первая», «Предыдущая» и номера 1 и 2
+        self.assertContains(response, 'page-link', count=4)
+
 
 class CommentViewsTests(TestCase):
     @classmethod
@@ -74,6 +155,49 @@ class CommentViewsTests(TestCase):
         first_object = response.context['comments'][0]
         self.assertEqual(self.comment.text, first_object.text)
 
+    def test_post_detail_shows_only_own_comments(self):
+        '''На странице поста только комментарии к этому посту.'''
+        other_post = Post.objects.create(author=self.user, text='Другой')
+        Comment.objects.create(post=other_post, author=self.user, text='x')
+        own = Comment.objects.create(
+            post=self.post, author=self.user, text='y'
+        )
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(list(response.context['comments']), [own])
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        '''Авторы комментариев загружаются одним запросом.'''
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        Comment.objects.create(post=self.post, author=self.user, text='0')
+        with CaptureQueriesContext(connection) as one_comment:
+            self.guest_client.get(url)
+        for i in range(5):
+            author = User.objects.create_user(username=f'commentator{i}')
+            Comment.objects.create(post=self.post, author=author, text=i)
+        with CaptureQueriesContext(connection) as many_comments:
+            self.guest_client.get(url)
+        self.assertEqual(len(one_comment), len(many_comments))
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_page_is_paginated(self):
+        '''Комментарии отдаются страницами через отдельную страницу.'''
+        comments = [
+            Comment.objects.create(post=self.post, author=self.user, text=i)
+            for i in range(3)
+        ]
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        first_page = response.context['comments']
+        self.assertEqual(list(first_page), comments[:2])
+
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': first_page.paginator.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'posts/comments.html')
+        self.assertEqual(list(response.context['comments']), comments[2:])
+
 
 class PostsViewsTests(TestCase):
     @classmethod
@@ -138,7 +262,7 @@ class PostsViewsTests(TestCase):
         cache.clear()
 
 
-class PostsContextTests(TestCase):
+class PostsContextTests(OnCommitMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -254,11 +378,12 @@ class PostsContextTests(TestCase):
         """ Проверка работы кэширования для
         страницы index """
         template_for_check = 'posts:index'
-        response_0 = self.authorized_client.get(reverse(template_for_check))
         self.post = Post.objects.create(
             author=self.user,
             text='Тестовый пост',
         )
+        response_0 = self.authorized_client.get(reverse(template_for_check))
+        Post.objects.filter(pk=self.post.pk).update(text='Правка мимо ORM')
         response_1 = self.authorized_client.get(reverse(template_for_check))
         self.assertEqual(response_0.content, response_1.content)
         cache.clear()
@@ -266,6 +391,63 @@ class PostsContextTests(TestCase):
         self.assertNotEqual(response_1.content, response_2.content)
         cache.clear()
 
+    def test_cache_index_is_reset_on_write(self):
+        """Новый пост виден на главной сразу, без ожидания TTL."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertContains(self.authorized_client.get(url), 'Свежий пост')
+        cache.clear()
+
+    def test_page_version_changes_again_on_commit(self):
+        """Страница, собранная до фиксации записи, после неё не отдаётся."""
+        key = version_key('page', 'index')
+        versions = get_versions([key])
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Post.objects.create(author=self.user, text='Свежий пост')
+            versions += get_versions([key])
+        versions += get_versions([key])
+        self.assertTrue(callbacks)
+        self.assertEqual(len(set(versions)), 3)
+
+    def test_server_ttl_is_not_sent_to_browser(self):
+        """Браузер перепроверяет главную и поиск, а не хранит их по TTL."""
+        for params in ({}, {'q': 'пост'}):
+            for attempt in ('miss', 'hit'):
+                with self.subTest(params=params, attempt=attempt):
+                    response = self.authorized_client.get(
+                        reverse('posts:index'), params
+                    )
+                    self.assertIn('no-cache', response['Cache-Control'])
+                    self.assertIn('max-age=0', response['Cache-Control'])
+                    self.assertFalse(response.has_header('Expires'))
+        cache.clear()
+
+    def test_cached_page_is_not_shared_between_users(self):
+        """Закэшированная шапка одного пользователя не видна другому."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.assertNotContains(
+            self.follower_client.get(url),
+            f'Пользователь: {self.user.username}'
+        )
+        cache.clear()
+
+    def test_stale_page_is_served_while_rebuilding(self):
+        """Пока страницу пересобирает другой запрос, отдаётся прежняя."""
+        url = reverse('posts:index')
+        response_0 = self.guest_client.get(url)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        cache_key = get_cache_key(
+            RequestFactory().get(url), 'index_page', 'GET', cache=cache
+        )
+        cache.add(cache_key + '.lock', 1)
+        response_1 = self.guest_client.get(url)
+        self.assertEqual(response_0.content, response_1.content)
+        cache.delete(cache_key + '.lock')
+        self.assertContains(self.guest_client.get(url), 'Свежий пост')
+        cache.clear()
+
     def test_follow_unfollow(self):
         """ Проверка функции подписки и отписки"""
         created = Follow.objects.get_or_create(
@@ -310,3 +492,407 @@ class PostsContextTests(TestCase):
         response_not_follower = (self.not_follower_client.get(
             reverse('posts:follow_index')))
         self.assertNotEqual(response_not_follower, response_follower)
+
+
+class TimelineViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_posts_are_pushed_to_follower_timeline(self):
+        """Подписка переносит старые посты, публикация — новые."""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'Author'}
+        ))
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(self.get_feed(), [new_post, old_post])
+
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Author'}
+        ))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.get_feed(), [])
+
+    def test_follow_pulls_many_posts(self):
+        """Подписка на автора с сотнями постов укладывается в лимиты SQLite."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=number) for number in range(600)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 600
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_read_on_request(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        popular_post = Post.objects.create(author=self.author, text='Хит')
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.get_feed(), [popular_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_limit_is_backfilled(self):
+        """Посты, вышедшие без раскладки, попадают в ленту после отписок."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        other_follow = Follow.objects.create(user=other, author=self.author)
+        pulled_post = Post.objects.create(author=self.author, text='Хит')
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        other_follow.delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=pulled_post
+        ))
+        self.assertEqual(self.get_feed(), [pulled_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_backfill_skips_entries_added_meanwhile(self):
+        """Запись, уже разложенную другим запросом, backfill пропускает."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        other_follow = Follow.objects.create(user=other, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=text)
+            for text in ('Первый', 'Второй')
+        ]
+        TimelineEntry.objects.create(
+            user=self.reader, post=posts[0], author=self.author,
+            pub_date=posts[0].pub_date,
+        )
+        other_follow.delete()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+
+class SearchViewsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Путешествия',
+            slug='travel',
+            description='Тестовое описание',
+        )
+        cls.river_post = Post.objects.create(
+            author=cls.user, text='Сплав по реке Волге', group=cls.group
+        )
+        cls.city_post = Post.objects.create(
+            author=cls.user, text='Прогулка по городу'
+        )
+
+    def search(self, query):
+        cache.clear()
+        response = self.client.get(reverse('posts:index'), {'q': query})
+        self.assertEqual(response.context['keyword'], query)
+        return list(response.context['page_obj'])
+
+    def test_search_by_text_group_and_author(self):
+        """Поиск находит посты по тексту, группе и имени автора."""
+        self.assertEqual(self.search('волге'), [self.river_post])
+        self.assertEqual(self.search('путешеств'), [self.river_post])
+        self.assertCountEqual(
+            self.search('толстой'), [self.river_post, self.city_post]
+        )
+        self.assertEqual(self.search('"OR*'), [])
+
+    def test_search_index_follows_changes(self):
+        """Индекс обновляется при правке, удалении и переименовании."""
+        self.city_post.text = 'Прогулка по набережной'
+        self.city_post.save()
+        self.assertEqual(self.search('набережной'), [self.city_post])
+
+        self.group.title = 'Реки'
+        self.group.save()
+        self.assertEqual(self.search('реки'), [self.river_post])
+
+        self.city_post.delete()
+        self.assertEqual(self.search('набережной'), [])
+
+    def test_rebuild_search_index_command(self):
+        """rebuild_search_index индексирует посты из bulk_create."""
+        Post.objects.bulk_create([Post(author=self.user, text='Байкал')])
+        self.assertEqual(self.search('байкал'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('байкал')), 1)
+
+    def test_match_expression(self):
+        """Операторы из ввода не попадают в запрос к индексу."""
+        query = 'Волга & !реки" OR*'
+        self.assertEqual(
+            match_expression(query), '"Волга"* "реки"* "OR"*'
+        )
+        self.assertEqual(
+            match_expression(query, 'postgresql'),
+            "'Волга':* & 'реки':* & 'OR':*"
+        )
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CardAuthor')
+        cls.reader = User.objects.create_user(username='CardReader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='cards',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Исходный текст', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse('posts:group_list', kwargs={'slug': 'cards'})
+
+    def test_cards_are_cached_until_post_changes(self):
+        """Карточка берётся из кэша, пока пост не сохранён заново."""
+        self.client.get(self.url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertContains(self.client.get(self.url), 'Исходный текст')
+
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Новый текст')
+
+    def test_edit_button_is_stitched_per_user(self):
+        """Кнопку редактирования в общей карточке видит только автор."""
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        self.assertContains(self.author_client.get(self.url), edit_url)
+        self.assertNotContains(self.reader_client.get(self.url), edit_url)
+        self.assertNotContains(self.client.get(self.url), edit_url)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='conditional',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = (
+            reverse('posts:group_list', kwargs={'slug': 'conditional'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_not_modified_before_rendering(self):
+        """Совпавший ETag даёт 304 без шаблонов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['ETag'].startswith('W/'))
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertFalse(not_modified.templates)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_post_not_modified_since(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        not_modified = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_lists_without_last_modified(self):
+        """Правка и удаление старого поста не дают 304 по дате."""
+        since = http_date(time.time() + 60)
+        for url in self.urls[:2]:
+            for change in ('save', 'delete'):
+                with self.subTest(url=url, change=change):
+                    old = Post.objects.create(
+                        author=self.user, text='Старый', group=self.group,
+                    )
+                    Post.objects.filter(pk=old.pk).update(
+                        pub_date=self.post.pub_date - timedelta(days=1)
+                    )
+                    response = self.client.get(url)
+                    self.assertFalse(response.has_header('Last-Modified'))
+                    getattr(Post.objects.get(pk=old.pk), change)()
+                    response = self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=since
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_etag_changes_on_write(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        Post.objects.create(author=self.user, text='Новый', group=self.group)
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_edit_changes_post_page(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Старый комментарий'
+        )
+        etag = self.client.get(url)['ETag']
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный комментарий')
+        self.assertNotContains(response, 'Старый комментарий')
+
+    def test_cache_control_depends_on_login(self):
+        """Анонимную страницу может кэшировать прокси, личную — нет."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                anonymous = self.client.get(url)
+                self.assertIn('public', anonymous['Cache-Control'])
+                self.assertIn('s-maxage', anonymous['Cache-Control'])
+                self.assertIn('Cookie', anonymous['Vary'])
+                personal = self.authorized_client.get(url)
+                self.assertIn('private', personal['Cache-Control'])
+                self.assertNotIn('public', personal['Cache-Control'])
+                self.assertNotEqual(personal['ETag'], anonymous['ETag'])
+
+
+class PageHolesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HoleAuthor')
+        cls.reader = User.objects.create_user(username='HoleReader')
+        cls.post = Post.objects.create(author=cls.author, text='Общий текст')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'HoleAuthor'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_one_cached_page_for_everybody(self):
+        """Скелет из кэша общий, личные фрагменты у каждого свои."""
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.pk})
+        for url in self.urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.author_client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(text='Тихо')
+                anonymous = self.client.get(url)
+                reader = self.reader_client.get(url)
+                author = self.author_client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(text='Общий текст')
+                for response in (anonymous, reader, author):
+                    self.assertContains(response, 'Общий текст')
+                    self.assertNotContains(response, '<!-- hole:')
+                    self.assertIn('Cookie', response['Vary'])
+                self.assertContains(anonymous, 'Войти')
+                self.assertContains(reader, 'Пользователь: HoleReader')
+                self.assertContains(author, 'Пользователь: HoleAuthor')
+                self.assertNotContains(reader, edit_url)
+                self.assertContains(author, edit_url)
+
+    def test_personal_fragments(self):
+        profile_url, detail_url = self.urls[1:]
+        follow_url = reverse(
+            'posts:profile_follow', kwargs={'username': 'HoleAuthor'}
+        )
+        self.assertNotContains(self.client.get(profile_url), follow_url)
+        self.assertContains(self.reader_client.get(profile_url), follow_url)
+        self.assertNotContains(self.author_client.get(profile_url), follow_url)
+        comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk}
+        )
+        self.assertNotContains(self.client.get(detail_url), comment_url)
+        response = self.reader_client.get(detail_url)
+        self.assertContains(response, comment_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+
+class FeedQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Число запросов лент не зависит от числа постов на странице."""
+    budget = 6
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}', first_name='Имя'
+            )
+            for number in range(3)
+        ]
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_group',
+            description='Тестовое описание группы',
+        )
+        for number in range(settings.ITEMS_PER_PAGE + 3):
+            Post.objects.create(
+                author=cls.authors[number % 3],
+                group=cls.group if number % 2 else None,
+                text=f'Пост номер {number}',
+            )
+        for author in cls.authors:
+            Follow.objects.create(user=cls.follower, author=author)
+
+    def setUp(self):
+        self.client.force_login(self.follower)
+        cache.clear()
+
+    def test_feeds_fit_query_budget(self):
+        """Ленты укладываются в бюджет запросов без кэша и с ним."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:index') + '?q=Пост',
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.authors[0].username]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            for attempt in ('cold', 'warm'):
+                with self.subTest(url=url, attempt=attempt):
+                    with self.assertMaxQueries(self.budget):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
@@ -0,0 +1,99 @@
+"""Миниатюры картинок постов, собранные вне запроса.
+
+После сохранения поста с новой картинкой задача уходит в пул потоков.
+Для каждого размера из ``THUMBNAIL_SIZES`` и каждого формата из
+``THUMBNAIL_FORMATS``, который поддерживает установленный Pillow,
+миниатюра создаётся через sorl-thumbnail, чтобы тег ``{% thumbnail %}``
+находил её в своём хранилище. URL основной миниатюры сохраняется в
+``Post.thumbnail``, и шаблоны используют его без обращения к sorl.
+"""
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+PIL_FEATURES = {'WEBP': 'webp'}
+
+_executor = None
+
+
+def supported_formats():
+    """Форматы из настроек, которые умеют и sorl, и Pillow."""
+    return [
+        image_format for image_format in settings.THUMBNAIL_FORMATS
+        if image_format in EXTENSIONS and (
+            image_format not in PIL_FEATURES
+            or features.check(PIL_FEATURES[image_format])
+        )
+    ]
+
+
+def make_thumbnails(image):
+    """Создать все миниатюры картинки и вернуть URL основной."""
+    url = ''
+    for name, (geometry, options) in settings.THUMBNAIL_SIZES.items():
+        for image_format in supported_formats():
+            thumbnail = get_thumbnail(
+                image, geometry, format=image_format, **options
+            )
+            if not url and name == settings.THUMBNAIL_MAIN_SIZE:
+                url = thumbnail.url
+    return url
+
+
+def generate_thumbnails(post_id):
+    """Собрать миниатюры поста и записать URL основной в пост."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return
+    url = make_thumbnails(post.image) if post.image else ''
+    if url != post.thumbnail:
+        post.thumbnail = url
+        post.save(update_fields=['thumbnail'])
+
+
+def safe_generate_thumbnails(post_id):
+    """Ошибка картинки не должна ломать запрос: шаблон обойдётся sorl."""
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+
+
+def run_job(post_id):
+    try:
+        safe_generate_thumbnails(post_id)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def schedule_thumbnails(post_id):
+    """Поставить пост в очередь после фиксации транзакции.
+
+    При ``THUMBNAIL_WORKERS = 0`` миниатюры собираются сразу в том же потоке.
+    """
+    def submit():
+        if settings.THUMBNAIL_WORKERS:
+            get_executor().submit(run_job, post_id)
+        else:
+            safe_generate_thumbnails(post_id)
+    transaction.on_commit(submit)
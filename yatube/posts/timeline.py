@@ -0,0 +1,201 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from .models import (
+    FEED_FIELDS, KEY_FIELDS, Follow, Post, TimelineEntry, UserCounters,
+)
+from .utils import CursorPaginator
+
+BATCH_SIZE = 1000
+# Пользователей в одном INSERT … SELECT: лимит переменных SQLite
+REBUILD_BATCH_SIZE = 500
+
+
+def is_pulled(author_id):
+    """Посты автора с числом подписчиков выше лимита читаются при показе."""
+    return UserCounters.objects.filter(
+        pk=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def push_entries(entries):
+    """Записать записи ленты пачками по ``BATCH_SIZE``.
+
+    Размер одного INSERT выбирает бэкенд базы: явный ``batch_size`` в
+    ``bulk_create`` не ограничивается лимитами SQLite на число переменных.
+    """
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def push_post(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    push_entries(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def pull_author(user_id, author_id):
+    """Добавить в ленту пользователя уже опубликованные посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by().values_list(
+        'pk', 'pub_date'
+    )
+    push_entries(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def backfill_author(author_id):
+    """Дописать в ленты посты автора, снова опустившегося до лимита.
+
+    Пока подписчиков было больше ``TIMELINE_FANOUT_LIMIT``, новые посты
+    автора в ленты не раскладывались; без этого они пропали бы из лент,
+    как только автор перестанет подмешиваться при чтении.
+    """
+    if not UserCounters.objects.filter(
+        pk=author_id, followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists():
+        return
+    # Запись, которую одновременно добавил push_post, пропускается
+    sql = (
+        '{} {} (user_id, post_id, author_id, pub_date) '
+        'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+        'FROM {} follow JOIN {} post ON post.author_id = follow.author_id '
+        'WHERE follow.author_id = %s {}'
+    ).format(
+        connection.ops.insert_statement(ignore_conflicts=True),
+        TimelineEntry._meta.db_table,
+        Follow._meta.db_table,
+        Post._meta.db_table,
+        connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql.rstrip(), [author_id])
+
+
+def drop_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_timeline(user_id):
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).values_list(
+        'author_id', flat=True
+    )
+    for author_id in authors:
+        pull_author(user_id, author_id)
+
+
+def rebuild_timelines(user_ids):
+    """Пересобрать ленты многих пользователей запросами ``INSERT … SELECT``.
+
+    Делает то же, что ``rebuild_timeline`` для каждого, но без загрузки
+    постов в Python: нужно после массовой загрузки в обход сигналов.
+    """
+    user_ids = iter(user_ids)
+    while True:
+        batch = list(islice(user_ids, REBUILD_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.filter(user_id__in=batch).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {TimelineEntry._meta.db_table} '
+                f'(user_id, post_id, author_id, pub_date) '
+                f'SELECT follow.user_id, post.id, post.author_id, '
+                f'post.pub_date FROM {Follow._meta.db_table} follow '
+                f'JOIN {Post._meta.db_table} post '
+                f'ON post.author_id = follow.author_id '
+                f'JOIN {UserCounters._meta.db_table} counters '
+                f'ON counters.user_id = follow.author_id '
+                f'WHERE counters.followers_count <= %s '
+                f'AND follow.user_id IN ({", ".join(["%s"] * len(batch))})',
+                [settings.TIMELINE_FANOUT_LIMIT, *batch]
+            )
+
+
+class TimelinePaginator(CursorPaginator):
+    """Лента подписок: материализованные записи плюс посты «тяжёлых» авторов.
+
+    Записи ``TimelineEntry`` читаются одним диапазоном по индексу. Посты
+    авторов, у которых подписчиков больше ``TIMELINE_FANOUT_LIMIT``, в ленты
+    не раскладываются и подмешиваются при чтении (fan-out on read).
+
+    С ``keys_only`` посты загружаются только с ``KEY_FIELDS``.
+    """
+    entry_key = ('pub_date', 'post_id')
+
+    def __init__(self, user, per_page, keys_only=False, **kwargs):
+        self.user = user
+        self.keys_only = keys_only
+        self.pulled_authors = list(
+            Follow.objects.filter(
+                user=user,
+                author__counters__followers_count__gt=(
+                    settings.TIMELINE_FANOUT_LIMIT
+                )
+            ).values_list('author_id', flat=True)
+        )
+        posts = Post.objects.filter(author__in=self.pulled_authors)
+        posts = posts.keys_only() if keys_only else posts.for_feed()
+        super().__init__(posts, per_page, **kwargs)
+
+    def fetch(self, key_values, backwards):
+        entries = TimelineEntry.objects.filter(user=self.user)
+        if self.keys_only:
+            entries = entries.select_related('post')
+            fields = KEY_FIELDS
+        else:
+            entries = entries.select_related('post__author', 'post__group')
+            fields = FEED_FIELDS
+        entries = entries.only(
+            'pub_date', 'post', *('post__' + field for field in fields)
+        )
+        prefix = '-' if self.descending != backwards else ''
+        entries = entries.order_by(
+            *(prefix + field for field in self.entry_key)
+        )
+        if key_values is not None:
+            entries = entries.filter(
+                self.keyset_filter(key_values, backwards, self.entry_key)
+            )
+        posts = [entry.post for entry in entries[:self.per_page + 1]]
+        if self.pulled_authors:
+            posts += self.fetch_objects(key_values, backwards)
+        unique_posts = {post.pk: post for post in posts}.values()
+        return sorted(
+            unique_posts,
+            key=self.key_values,
+            reverse=self.descending != backwards
+        )[:self.per_page + 1]
+
+
+def get_page_of_timeline(request):
+    paginator = TimelinePaginator(request.user, settings.ITEMS_PER_PAGE)
+    return paginator.get_page_by_cursor(request.GET.get('cursor'))
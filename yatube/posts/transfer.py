@@ -0,0 +1,367 @@
+"""Выгрузка и загрузка контента в формате NDJSON.
+
+Каждая строка — объект ``{"model": ..., "data": {...}}``. Модели идут в
+порядке зависимостей: пользователи, группы, посты, комментарии, подписки.
+Пользователи и группы ссылаются друг на друга по ``username`` и ``slug``,
+посты и комментарии сохраняют свои ``id``, чтобы комментарии находили
+пост без таблицы соответствия. Поэтому загружать можно только в базу,
+где под теми же ``id`` нет других постов и комментариев: иначе загрузка
+останавливается с ``ImportConflict``.
+
+Чтение идёт через ``iterator()``, запись — пачками с пропуском
+конфликтов (``bulk_create`` для пользователей и групп, ``executemany``
+для остального): память не зависит от числа постов и комментариев
+(в ней только соответствие ``username`` и ``slug`` их id), а повторная
+загрузка того же файла ничего не дублирует. Сигналы при массовой записи
+не срабатывают: счётчики, поисковый индекс, ленты подписок, версии кэша
+и статистика планировщика пересобираются после загрузки.
+"""
+import datetime
+import gzip
+import itertools
+import json
+import os
+import shutil
+
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from . import search
+from .cache import bump_version
+from .counters import rebuild_counters, refresh_statistics
+from .models import Comment, Follow, Group, Post
+from .timeline import rebuild_timelines
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+READ_CHUNK_SIZE = 2000
+
+EXPORTS = (
+    ('user', User.objects.order_by('pk'), (
+        'username', 'password', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+    )),
+    ('group', Group.objects.order_by('pk'), (
+        'slug', 'title', 'description',
+    )),
+    ('post', Post.objects.order_by('pk'), (
+        'id', 'text', 'pub_date', 'updated_at', 'version', 'image',
+        'author__username', 'group__slug',
+    )),
+    ('comment', Comment.objects.order_by('pk'), (
+        'id', 'post_id', 'text', 'pub_date', 'updated_at', 'version',
+        'author__username',
+    )),
+    ('follow', Follow.objects.order_by('pk'), (
+        'user__username', 'author__username',
+    )),
+)
+
+
+class ImportConflict(Exception):
+    """В базе под ``id`` из файла уже лежит другая запись."""
+
+
+class TransferEncoder(DjangoJSONEncoder):
+    """Даты с микросекундами: от них зависит порядок постов в лентах."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def batched(objects, size=BATCH_SIZE):
+    iterator = iter(objects)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Отключить ``auto_now_add``, чтобы сохранить заданные даты."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def open_ndjson(path, mode):
+    """Открыть файл NDJSON; ``.gz`` в имени включает сжатие."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def export_records(output, media_dir=None):
+    """Записать весь контент в ``output`` и вернуть число строк по моделям.
+
+    С ``media_dir`` картинки постов копируются туда с теми же путями.
+    """
+    counts = {}
+    for model_name, queryset, fields in EXPORTS:
+        counts[model_name] = 0
+        rows = queryset.values(*fields).iterator(chunk_size=READ_CHUNK_SIZE)
+        for row in rows:
+            output.write(json.dumps(
+                {'model': model_name, 'data': row},
+                cls=TransferEncoder,
+                ensure_ascii=False,
+            ) + '\n')
+            counts[model_name] += 1
+            if media_dir and model_name == 'post' and row['image']:
+                copy_to_dir(row['image'], media_dir)
+    return counts
+
+
+def copy_to_dir(name, media_dir):
+    target = os.path.join(media_dir, name)
+    if os.path.exists(target) or not default_storage.exists(name):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with default_storage.open(name) as source, open(target, 'wb') as copy:
+        shutil.copyfileobj(source, copy)
+
+
+def adapt_datetime(value):
+    """Дата из файла в том виде, в каком её пишет в базу ORM."""
+    return connection.ops.adapt_datetimefield_value(
+        datetime.datetime.fromisoformat(value)
+    )
+
+
+def change_dates(row):
+    """``pub_date``, ``updated_at`` и ``version`` строки для записи.
+
+    В старых выгрузках этих полей нет: запись не правилась после публикации.
+    """
+    pub_date = adapt_datetime(row['pub_date'])
+    updated_at = row.get('updated_at')
+    return (
+        pub_date,
+        adapt_datetime(updated_at) if updated_at else pub_date,
+        row.get('version', 1),
+    )
+
+
+def insert_rows(model, field_names, rows):
+    """Вставить готовые значения одним ``executemany``, пропуская дубли.
+
+    Для постов, комментариев и подписок ``bulk_create`` тратит больше
+    времени на модели и сборку SQL, чем база на саму запись.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in field_names]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        connection.ops.insert_statement(ignore_conflicts=True),
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+        connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql.rstrip(), rows)
+
+
+class Importer:
+    """Загрузка строк NDJSON пачками по ``batch_size``.
+
+    После каждой зафиксированной пачки вызывается ``on_progress`` с числом
+    полностью загруженных строк: по нему загрузку можно продолжить с места
+    остановки параметром ``skip``.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, media_dir=None,
+                 on_progress=None):
+        self.batch_size = batch_size
+        self.media_dir = media_dir
+        self.on_progress = on_progress or (lambda line_number: None)
+        self.user_ids = {}
+        self.group_ids = {}
+        self.followers = set()
+        self.authors = set()
+        self.groups = set()
+        self.counts = {name: 0 for name, _, _ in EXPORTS}
+
+    def load(self, lines, skip=0):
+        pending_model, pending, line_number = None, [], skip
+        for line_number, line in enumerate(
+            itertools.islice(lines, skip, None), start=skip + 1
+        ):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if pending and (
+                record['model'] != pending_model
+                or len(pending) >= self.batch_size
+            ):
+                self.flush(pending_model, pending, line_number - 1)
+                pending = []
+            pending_model = record['model']
+            pending.append(record['data'])
+        if pending:
+            self.flush(pending_model, pending, line_number)
+        return self.counts
+
+    def flush(self, model_name, rows, line_number):
+        with transaction.atomic():
+            getattr(self, f'create_{model_name}s')(rows)
+        self.counts[model_name] += len(rows)
+        self.on_progress(line_number)
+
+    def resolve(self, cache, queryset, field, names):
+        """id объектов по естественному ключу с запросом только для новых."""
+        missing = {name for name in names if name and name not in cache}
+        if missing:
+            cache.update(queryset.filter(
+                **{f'{field}__in': missing}
+            ).values_list(field, 'pk'))
+        return cache
+
+    def check_ids(self, model, fields, rows):
+        """Строки ``rows`` (``id`` → значения ``fields``) не заняты чужими.
+
+        Запись с тем же ``id`` и теми же значениями — загруженная раньше
+        из этого же файла, её пропускает ``insert_rows``. С другими
+        значениями это чужая запись, и пропускать её нельзя: комментарии
+        из файла попали бы к чужому посту.
+        """
+        existing = model.objects.filter(pk__in=rows).values_list(
+            'pk', *fields
+        )
+        for pk, *values in existing:
+            if tuple(values) != rows[pk]:
+                raise ImportConflict(
+                    f'{model._meta.model_name} с id={pk} уже есть в базе и '
+                    f'не совпадает с записью из файла'
+                )
+
+    def users(self, names):
+        return self.resolve(self.user_ids, User.objects, 'username', names)
+
+    def create_users(self, rows):
+        User.objects.bulk_create(
+            [User(**row) for row in rows], ignore_conflicts=True
+        )
+
+    def create_groups(self, rows):
+        Group.objects.bulk_create(
+            [Group(**row) for row in rows], ignore_conflicts=True
+        )
+
+    def create_posts(self, rows):
+        users = self.users(row['author__username'] for row in rows)
+        groups = self.resolve(
+            self.group_ids, Group.objects, 'slug',
+            (row['group__slug'] for row in rows)
+        )
+        self.check_ids(Post, ('author', 'pub_date'), {
+            row['id']: (
+                users[row['author__username']],
+                datetime.datetime.fromisoformat(row['pub_date']),
+            )
+            for row in rows
+        })
+        values = []
+        for row in rows:
+            if self.media_dir and row['image']:
+                self.copy_image(row['image'])
+            author_id = users[row['author__username']]
+            group_id = groups.get(row['group__slug'])
+            self.authors.add(author_id)
+            if group_id is not None:
+                self.groups.add(group_id)
+            values.append((
+                row['id'], row['text'], *change_dates(row), row['image'], '',
+                0, author_id, group_id,
+            ))
+        insert_rows(Post, (
+            'id', 'text', 'pub_date', 'updated_at', 'version', 'image',
+            'thumbnail', 'comments_count', 'author', 'group',
+        ), values)
+
+    def create_comments(self, rows):
+        users = self.users(row['author__username'] for row in rows)
+        self.check_ids(Comment, ('post', 'author', 'pub_date'), {
+            row['id']: (
+                row['post_id'], users[row['author__username']],
+                datetime.datetime.fromisoformat(row['pub_date']),
+            )
+            for row in rows
+        })
+        insert_rows(Comment, (
+            'id', 'post', 'text', 'pub_date', 'updated_at', 'version',
+            'author',
+        ), [
+            (
+                row['id'], row['post_id'], row['text'], *change_dates(row),
+                users[row['author__username']],
+            )
+            for row in rows
+        ])
+
+    def create_follows(self, rows):
+        users = self.users(itertools.chain.from_iterable(
+            (row['user__username'], row['author__username']) for row in rows
+        ))
+        values = [
+            (users[row['user__username']], users[row['author__username']])
+            for row in rows
+        ]
+        self.followers.update(user_id for user_id, _ in values)
+        insert_rows(Follow, ('user', 'author'), values)
+
+    def copy_image(self, name):
+        source = os.path.join(self.media_dir, name)
+        if default_storage.exists(name) or not os.path.exists(source):
+            return
+        with open(source, 'rb') as image:
+            default_storage.save(name, File(image))
+
+    def finish(self, everything=False):
+        """Пересобрать то, что при записи поддерживают сигналы.
+
+        При продолжении прерванной загрузки (``everything``) неизвестно, что
+        загрузили прошлые запуски, поэтому ленты и версии кэша лент
+        пересобираются для всех авторов и групп.
+        """
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Post, Comment]
+            ):
+                cursor.execute(sql)
+        rebuild_counters()
+        search.rebuild_index()
+        refresh_statistics()
+        authors, groups = self.authors, self.groups
+        if everything:
+            authors = set(Post.objects.order_by().values_list(
+                'author_id', flat=True
+            ).distinct().iterator())
+            groups = set(Group.objects.values_list('pk', flat=True))
+        follower_ids = self.followers | set(Follow.objects.filter(
+            author_id__in=authors
+        ).values_list('user_id', flat=True).distinct().iterator())
+        rebuild_timelines(sorted(follower_ids))
+        bump_version('page', 'all')
+        bump_version('feed', 'index')
+        for author_id in authors:
+            bump_version('feed', 'author', author_id)
+        for group_id in groups:
+            bump_version('feed', 'group', group_id)
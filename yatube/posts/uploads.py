@@ -0,0 +1,162 @@
+"""Приём картинок постов с ограниченным расходом памяти.
+
+Файл больше ``FILE_UPLOAD_MAX_MEMORY_SIZE`` пишется кусками во временный
+файл (``LimitedUploadHandler``). После ``UPLOAD_IMAGE_MAX_BYTES`` разбор
+запроса прекращается: остаток тела дочитывается без записи, чтобы клиент
+получил ответ с ошибкой, а не сброс соединения. Имя поля запоминается в
+``request.oversized_upload``, и форма отклоняет файл по размеру. Совсем
+большие тела лучше не пускать дальше прокси (``client_max_body_size`` в
+nginx). Перед
+декодированием читается только заголовок: ``forms.ImageField`` проверяет
+структуру файла (``Image.verify``), а ``PostForm.clean_image`` сверяет
+формат и число пикселей с ``UPLOAD_IMAGE_FORMATS`` и
+``UPLOAD_IMAGE_MAX_PIXELS``. Форматы, которые ``Image.draft`` не уменьшает
+при декодировании, ограничены ``UPLOAD_IMAGE_MAX_FULL_PIXELS``.
+
+Картинка больше ``UPLOAD_IMAGE_MAX_SIDE`` по длинной стороне или с EXIF
+перекодируется: JPEG декодируется сразу в уменьшенном масштабе
+(``Image.draft``), поворачивается по ориентации из EXIF и сохраняется без
+метаданных. Остальные файлы сохраняются как есть, без потери качества.
+"""
+import os
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import (
+    StopUpload, TemporaryFileUploadHandler,
+)
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+CONTENT_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+# Декодируются сразу в уменьшенном масштабе (``Image.draft``)
+DRAFT_FORMATS = {'JPEG'}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Временный файл, загрузка которого обрывается на лимите.
+
+    Остальные поля запроса после файла тоже теряются, поэтому форму
+    связывают и с пустыми данными (``oversized_upload``).
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_IMAGE_MAX_BYTES:
+            self.request.oversized_upload = self.field_name
+            raise StopUpload()
+        self.file.write(raw_data)
+
+
+def oversized_upload(request):
+    """Имя поля, загрузку которого оборвал ``LimitedUploadHandler``."""
+    return getattr(request, 'oversized_upload', None)
+
+
+def file_too_large():
+    return forms.ValidationError(
+        'Файл больше %(limit)s.',
+        code='file_too_large',
+        params={'limit': filesizeformat(settings.UPLOAD_IMAGE_MAX_BYTES)},
+    )
+
+
+def invalid_image_message():
+    return (
+        'Загрузите картинку {} не больше {}: этот файл повреждён, слишком '
+        'велик или не является картинкой.'.format(
+            ', '.join(settings.UPLOAD_IMAGE_FORMATS),
+            filesizeformat(settings.UPLOAD_IMAGE_MAX_BYTES),
+        )
+    )
+
+
+def max_pixels(image_format):
+    """Лимит пикселей: целиком декодируемые форматы ограничены сильнее."""
+    if image_format in DRAFT_FORMATS:
+        return settings.UPLOAD_IMAGE_MAX_PIXELS
+    return settings.UPLOAD_IMAGE_MAX_FULL_PIXELS
+
+
+def open_image(file):
+    """Открыть картинку, прочитав только заголовок, и проверить лимиты."""
+    file.seek(0)
+    try:
+        image = Image.open(file)
+    except Exception:
+        raise forms.ValidationError(
+            'Загрузите картинку: файл не распознан.', code='invalid_image'
+        )
+    if image.format not in settings.UPLOAD_IMAGE_FORMATS:
+        raise forms.ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image.format},
+        )
+    width, height = image.size
+    if width * height > max_pixels(image.format):
+        raise forms.ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+    return image
+
+
+def needs_normalizing(image):
+    if getattr(image, 'is_animated', False):
+        # Перекодирование оставило бы только первый кадр
+        return False
+    return (
+        max(image.size) > settings.UPLOAD_IMAGE_MAX_SIDE
+        or 'exif' in image.info or bool(image.getexif())
+    )
+
+
+def normalize(image, name):
+    """Уменьшенная, повёрнутая по EXIF копия без метаданных."""
+    side = settings.UPLOAD_IMAGE_MAX_SIDE
+    image_format = image.format
+    image.draft(image.mode, (side, side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side), Image.LANCZOS)
+    # PNG иначе записал бы EXIF из исходного файла
+    image.info.pop('exif', None)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    result = TemporaryUploadedFile(
+        os.path.splitext(name)[0] + EXTENSIONS[image_format],
+        CONTENT_TYPES[image_format], 0, None,
+    )
+    options = {'optimize': True}
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.UPLOAD_IMAGE_QUALITY
+    image.save(result.file, image_format, **options)
+    result.size = result.file.tell()
+    result.file.seek(0)
+    return result
+
+
+def prepare_image(file):
+    """Проверить загруженную картинку и вернуть файл для сохранения."""
+    if file.size > settings.UPLOAD_IMAGE_MAX_BYTES:
+        raise file_too_large()
+    try:
+        image = open_image(file)
+        if not needs_normalizing(image):
+            file.content_type = CONTENT_TYPES[image.format]
+            file.seek(0)
+            return file
+        return normalize(image, file.name)
+    except forms.ValidationError:
+        raise
+    except Exception:
+        raise forms.ValidationError(
+            'Загрузите картинку: файл повреждён.', code='invalid_image'
+        )
@@ -1,8 +1,233 @@
+from core.routers import primary
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
+from .cache import position_cache_key
 
-def get_page_of_paginator(request, posts):
-    paginator = Paginator(posts, settings.ITEMS_PER_PAGE)
+CURSOR_SALT = 'posts.cursor'
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре (pub_date, pk).
+
+    Страница выбирается условием ``WHERE (pub_date, pk) < (...)`` по индексу
+    ``pub_date`` вместо ``OFFSET``, поэтому далёкая страница стоит столько же,
+    сколько первая. ``COUNT(*)`` не выполняется: ``count`` и ``num_pages``
+    считаются от текущей позиции и показывают только, есть ли что-то дальше.
+
+    С ``cache_key`` список id каждой страницы кэшируется, и повторный показ
+    страницы загружает посты по первичному ключу. Сам список выбирается из
+    основной базы: кэш привязан к текущей версии ленты.
+    """
+    key = ('pub_date', 'pk')
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, descending=True,
+                 cache_key=None, **kwargs):
+        self.descending = descending
+        self.cache_key = cache_key
+        prefix = '-' if descending else ''
+        object_list = object_list.order_by(
+            *(prefix + field for field in self.key)
+        )
+        super().__init__(object_list, per_page, **kwargs)
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._number = 1
+
+    @property
+    def count(self):
+        return (self._number - 1) * self.per_page + (
+            self.per_page + 1 if self.next_cursor else self.per_page
+        )
+
+    @property
+    def num_pages(self):
+        return self._number + 1 if self.next_cursor else self._number
+
+    def get_page_by_cursor(self, cursor):
+        """Вернуть страницу по непрозрачному токену из ``?cursor=``.
+
+        Битый или подделанный токен даёт первую страницу.
+        """
+        position = self.decode_cursor(cursor) or {
+            'd': 'n', 'n': 1, 'k': None
+        }
+        backwards = position['d'] == 'p'
+        number = position['n']
+        objects = self.fetch(position['k'], backwards)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if position['k'] is None:
+            return self._build_page(objects, 1, False, has_more)
+        if backwards:
+            objects.reverse()
+            number = max(number, 2) if has_more else 1
+            return self._build_page(objects, number, has_more, True)
+        return self._build_page(objects, number, True, has_more)
+
+    def fetch(self, key_values, backwards):
+        if self.cache_key is None:
+            return self.fetch_objects(key_values, backwards)
+        key = position_cache_key(self.cache_key, key_values, backwards)
+        ids = cache.get(key)
+        if ids is None:
+            with primary():
+                objects = self.fetch_objects(key_values, backwards)
+            cache.set(
+                key,
+                [obj.pk for obj in objects],
+                settings.CACHES_TIME_FRAGMENTS
+            )
+            return objects
+        found = self.object_list.in_bulk(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+    def fetch_objects(self, key_values, backwards):
+        """Выбрать ``per_page + 1`` объектов после позиции ``key_values``.
+
+        Лишний объект нужен только чтобы узнать, есть ли следующая страница.
+        При ``backwards`` выборка идёт в обратном порядке от позиции.
+        """
+        queryset = self.object_list
+        if key_values is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(key_values, backwards)
+            )
+        if backwards:
+            queryset = queryset.reverse()
+        return list(queryset[:self.per_page + 1])
+
+    def keyset_filter(self, key_values, backwards, key=None):
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        (date_field, pk_field), (date, pk) = key or self.key, key_values
+        return Q(**{f'{date_field}__{lookup}': date}) | Q(
+            **{date_field: date, f'{pk_field}__{lookup}': pk}
+        )
+
+    def key_values(self, obj):
+        return [getattr(obj, field) for field in self.key]
+
+    def encode_cursor(self, obj, direction, number):
+        date, pk = self.key_values(obj)
+        return signing.dumps(
+            {'d': direction, 'n': number, 'k': [date.isoformat(), pk]},
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            position = signing.loads(cursor, salt=CURSOR_SALT)
+            date, pk = position['k']
+            position['k'] = [parse_datetime(date), int(pk)]
+            position['n'] = max(int(position['n']), 1)
+            direction = position['d']
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+        if direction not in ('n', 'p') or position['k'][0] is None:
+            return None
+        return position
+
+    def _build_page(self, objects, number, has_previous, has_next):
+        if has_next and objects:
+            self.next_cursor = self.encode_cursor(objects[-1], 'n', number + 1)
+        if has_previous and objects and number > 1:
+            self.previous_cursor = self.encode_cursor(
+                objects[0], 'p', number - 1
+            )
+        self._number = number
+        return Page(objects, number, self)
+
+
+class WindowedPage(Page):
+    @property
+    def window(self):
+        """Номера страниц вокруг текущей для навигации."""
+        first = max(self.number - settings.PAGE_WINDOW, 1)
+        last = self.number + settings.PAGE_WINDOW
+        return range(first, min(last, self.paginator.num_pages) + 1)
+
+
+class WindowedPaginator(Paginator):
+    """Нумерованные страницы без точного ``COUNT(*)`` на каждый запрос.
+
+    Общее число берётся из ``count`` — числа или функции, например
+    хранимого счётчика или ``counters.approximate_count``. Страница
+    выбирается с одной лишней строкой, поэтому ``has_next`` точен при любой
+    оценке, а ``count`` уточняется по загруженной странице, если оценка
+    разошлась с концом ленты. Навигация показывает только ``window``
+    страницы: ``PAGE_WINDOW`` номеров по обе стороны от текущего.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        self.count_source = count
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_source is None:
+            return Paginator.count.func(self)
+        if callable(self.count_source):
+            return self.count_source()
+        return self.count_source
+
+    def validate_number(self, number):
+        """Верхнюю границу проверяет ``page``: число страниц примерное."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть целым.')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1.')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not objects and number > 1:
+            self.set_count(Paginator.count.func(self))
+            raise EmptyPage('На этой странице ничего нет.')
+        if len(objects) > self.per_page:
+            self.set_count(max(self.count, bottom + self.per_page + 1))
+        else:
+            self.set_count(bottom + len(objects))
+        return WindowedPage(objects[:self.per_page], number, self)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            return self.page(self.num_pages)
+
+    def set_count(self, count):
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+
+
+def get_page_of_paginator(request, posts, cache_key=None, count=None):
+    """Страница ленты для шаблона ``posts/includes/paginator.html``.
+
+    По умолчанию используется ``CursorPaginator`` и параметр ``?cursor=``.
+    Старые ссылки вида ``?page=N`` продолжают работать через
+    ``WindowedPaginator`` с числом постов из ``count``.
+    """
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = WindowedPaginator(
+            posts, settings.ITEMS_PER_PAGE, count=count
+        )
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(
+        posts, settings.ITEMS_PER_PAGE, cache_key=cache_key
+    )
+    return paginator.get_page_by_cursor(request.GET.get('cursor'))
@@ -1,35 +1,82 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import Max
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from .cache import (
+    cache_page_versioned, conditional_page, feed_cache_key, page_version_keys,
+    version_key,
+)
+from .counters import approximate_count, cached_count, get_user_counters
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
-from .utils import get_page_of_paginator
+from .search import search_posts
+from .timeline import get_page_of_timeline
+from .uploads import oversized_upload
+from .utils import CursorPaginator, WindowedPaginator, get_page_of_paginator
 
 
-@cache_page(
-    settings.CACHES_TIME_DEFAULT,
-    key_prefix='index_page'
+@cache_page_versioned(
+    settings.CACHES_TIME_PAGES,
+    key_prefix='index_page',
+    versions=lambda: [('index',)]
 )
 def index(request):
-    """Главная страница"""
-    posts = Post.objects.select_related('author', 'group').all()
-    page_obj = get_page_of_paginator(request, posts)
+    """Главная страница и результаты поиска по ?q="""
+    keyword = request.GET.get('q', '').strip()
+    if keyword:
+        results = search_posts(keyword)
+        paginator = WindowedPaginator(
+            results,
+            settings.ITEMS_PER_PAGE,
+            count=lambda: cached_count(
+                'search:' + hashlib.md5(keyword.encode()).hexdigest(),
+                results.count
+            )
+        )
+        page_obj = paginator.get_page(request.GET.get('page'))
+    else:
+        posts = Post.objects.for_feed()
+        page_obj = get_page_of_paginator(
+            request, posts, feed_cache_key('index'),
+            count=lambda: approximate_count(Post)
+        )
     template = 'posts/index.html'
 
     context = {
         'page_obj': page_obj,
+        'keyword': keyword,
     }
 
     return render(request, template, context)
 
 
+def group_validators(slug):
+    """Версии страницы группы.
+
+    ``Last-Modified`` у списка не отдаётся: правка или удаление поста не
+    сдвигают время самого нового поста, а версии меняются при любой записи.
+    """
+    return page_version_keys([('group', slug)]), None
+
+
+@conditional_page(group_validators)
+@cache_page_versioned(
+    settings.CACHES_TIME_PAGES,
+    key_prefix='group_page',
+    versions=lambda slug: [('group', slug)]
+)
 def group_posts(request, slug):
     """Страница постов по группам"""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = get_page_of_paginator(request, posts)
+    posts = group.posts.for_feed()
+    page_obj = get_page_of_paginator(
+        request, posts, feed_cache_key('group', group.pk),
+        count=group.posts_count
+    )
     template = 'posts/group_list.html'
     context = {
         'group': group,
@@ -38,62 +85,142 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def profile_validators(username):
+    """Версии профиля; ``Last-Modified`` не отдаётся, как у группы."""
+    return page_version_keys([('author', username)]), None
+
+
+@conditional_page(profile_validators)
+@cache_page_versioned(
+    settings.CACHES_TIME_PAGES,
+    key_prefix='profile_page',
+    versions=lambda username: [('author', username)]
+)
 def profile(request, username):
     """Страница профиля пользователя"""
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author).all()
-    posts_count = author.posts.all().count
-    page_obj = get_page_of_paginator(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    posts = Post.objects.filter(author=author).for_feed()
+    posts_count = get_user_counters(author).posts_count
+    page_obj = get_page_of_paginator(
+        request, posts, feed_cache_key('author', author.pk),
+        count=posts_count
+    )
     template = 'posts/profile.html'
 
-    if request.user.is_authenticated:
-        checked = Follow.objects.filter(
-            user=request.user,
-            author=author
-        )
-        if checked.exists() is True:
-            following = True
-        else:
-            following = False
-    else:
-        following = False
-
     context = {
         'author': author,
         'page_obj': page_obj,
         'posts_count': posts_count,
-        'following': following
     }
     return render(request, template, context)
 
 
+def get_page_of_comments(request, post):
+    comments = Comment.objects.filter(post=post).select_related('author')
+    paginator = CursorPaginator(
+        comments,
+        settings.COMMENTS_PER_PAGE,
+        descending=False
+    )
+    return paginator.get_page_by_cursor(request.GET.get('cursor'))
+
+
+def post_detail_validators(post_id):
+    """Версии комментариев, автора и группы поста.
+
+    Время изменения — правка поста или его последний комментарий.
+    """
+    try:
+        post = Post.objects.values(
+            'author_id', 'group_id', 'updated_at'
+        ).annotate(latest_comment=Max('comments__pub_date')).get(pk=post_id)
+    except Post.DoesNotExist:
+        return page_version_keys([]), None
+    keys = page_version_keys([]) + [
+        version_key('comments', post_id),
+        version_key('user', post['author_id']),
+        version_key('group', post['group_id']),
+        # Число постов автора меняется вместе с его лентой
+        version_key('feed', 'author', post['author_id']),
+    ]
+    return keys, max(filter(None, (
+        post['updated_at'], post['latest_comment']
+    )))
+
+
+def post_page_versions(post_id):
+    """Пост и его автор: на странице есть число постов автора."""
+    usernames = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    )
+    return [('post', post_id)] + [
+        ('author', username) for username in usernames
+    ]
+
+
+@conditional_page(post_detail_validators)
+@cache_page_versioned(
+    settings.CACHES_TIME_PAGES,
+    key_prefix='post_page',
+    versions=post_page_versions
+)
 def post_detail(request, post_id):
     """Страница конкретного поста"""
-    post = get_object_or_404(Post, pk=post_id)
-    comments = Comment.objects.select_related('post').all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    comments = get_page_of_comments(request, post)
     form = CommentForm(request.POST or None)
     template = 'posts/post_detail.html'
     context = {
         'post': post,
+        'posts_count': get_user_counters(post.author).posts_count,
         'comments': comments,
         'form': form
     }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Страница комментариев поста, по COMMENTS_PER_PAGE за раз"""
+    post = get_object_or_404(Post, pk=post_id)
+    comments = get_page_of_comments(request, post)
+    template = 'posts/comments.html'
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, template, context)
+
+
+def post_form(request, instance=None):
+    """Форма поста; оборванная по размеру загрузка тоже связывает форму."""
+    data, files = request.POST, request.FILES
+    # Известно только после разбора тела запроса
+    oversized = oversized_upload(request)
+    return PostForm(
+        data if oversized else data or None,
+        files=files or None,
+        instance=instance,
+        oversized_upload=oversized,
+    )
+
+
 @login_required
 def post_create(request):
     """Создать новый пост"""
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None
-    )
+    form = post_form(request)
     template = 'posts/create_post.html'
     if not form.is_valid():
         return render(request, template, {'form': form, 'is_edit': False})
     new_post = form.save(commit=False)
     new_post.author = request.user
-    form.save()
+    with transaction.atomic():
+        form.save()
     return redirect('posts:profile', new_post.author)
 
 
@@ -101,11 +228,7 @@ def post_create(request):
 def post_edit(request, post_id):
     """Редактирование поста"""
     post = get_object_or_404(Post, pk=post_id)
-    form = PostForm(
-        request.POST or None,
-        files=request.FILES or None,
-        instance=post
-    )
+    form = post_form(request, instance=post)
     template = 'posts/create_post.html'
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
@@ -116,7 +239,8 @@ def post_edit(request, post_id):
             'is_edit': True,
         }
         return render(request, template, context)
-    form.save()
+    with transaction.atomic():
+        form.save()
     return redirect('posts:post_detail', post_id)
 
 
@@ -128,7 +252,8 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -137,10 +262,7 @@ def follow_index(request):
     """Страница с выводом постов авторов,
     на которых подписан текущий пользователь.
     """
-    follow_authors = request.user.follower.values_list('author', flat=True)
-
-    posts = Post.objects.filter(author__in=follow_authors)
-    page_obj = get_page_of_paginator(request, posts)
+    page_obj = get_page_of_timeline(request)
     template = 'posts/follow.html'
 
     context = {
@@ -155,10 +277,11 @@ def profile_follow(request, username):
     """ Подписка на пользователя """
     author = get_object_or_404(User, username=username)
     if request.user.username != username:
-        follow, created = Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(
+                user=request.user,
+                author=author
+            )
     return redirect('posts:profile', username=username)
 
 
@@ -171,5 +294,6 @@ def profile_unfollow(request, username):
             user=request.user,
             author=author
         )
-        follow.delete()
+        with transaction.atomic():
+            follow.delete()
     return redirect('posts:profile', username=username)
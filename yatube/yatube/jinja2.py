@@ -0,0 +1,33 @@
+"""Окружение Jinja2 для карточек постов (``YATUBE_JINJA2=1``).
+
+Даёт шаблонам те же помощники, что карточкам на языке шаблонов Django:
+``url``, ``static``, фильтры ``date`` и ``linebreaksbr`` и адрес миниатюры
+``thumbnail_url`` вместо тега ``{% thumbnail %}``.
+"""
+from django.template.defaultfilters import date, linebreaksbr
+from django.templatetags.static import static
+from django.urls import reverse
+from jinja2 import Environment
+from sorl.thumbnail import get_thumbnail
+
+
+def url(name, *args):
+    return reverse(name, args=args)
+
+
+def thumbnail_url(image, geometry, **options):
+    """Адрес миниатюры; пустая строка, если картинки нет или она битая."""
+    if not image:
+        return ''
+    try:
+        return get_thumbnail(image, geometry, **options).url
+    except Exception:
+        # Как и тег sorl: сломанная картинка не должна ронять ленту
+        return ''
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update(url=url, static=static, thumbnail_url=thumbnail_url)
+    env.filters.update(date=date, linebreaksbr=linebreaksbr)
+    return env
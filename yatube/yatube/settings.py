@@ -13,6 +13,11 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 import os
 
 ITEMS_PER_PAGE = 15
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 3
+COMMENTS_PER_PAGE = 20
+# Посты авторов с большим числом подписчиков не раскладываются по лентам
+TIMELINE_FANOUT_LIMIT = 10000
 ITEMS_FOR_TEST = 18
 
 LOGIN_URL = 'users:login'
@@ -29,6 +34,17 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загруженные файлы отдаёт core.views.serve_media. С YATUBE_MEDIA_ACCEL=nginx
+# байты передаёт nginx по X-Accel-Redirect на внутренний location
+# MEDIA_ACCEL_PREFIX, с sendfile — Apache или lighttpd по X-Sendfile; без
+# них gunicorn отдаёт FileResponse системным вызовом sendfile.
+MEDIA_ACCEL = os.getenv('YATUBE_MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Путь к функции (request, name) -> bool, например
+# 'core.media.authenticated_only'; без неё файлы доступны всем
+MEDIA_ACCESS = os.getenv('YATUBE_MEDIA_ACCESS', '')
+# Имена загрузок не переиспользуются, поэтому файлы кэшируются надолго
+MEDIA_MAX_AGE = 60 * 60 * 24 * 30
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -37,6 +53,39 @@ SECRET_KEY = 's&2)vt!4cvsaq5%cla*qc%p2y%w5vmqxx*u-top@jj^na0zly-'
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
+
+# Миниатюры картинок постов собираются в фоне после сохранения поста.
+# 0 потоков: собирать сразу, в потоке запроса; так работает отладка и тесты,
+# чтобы фоновый поток не писал в MEDIA_ROOT после конца теста.
+THUMBNAIL_WORKERS = int(
+    os.getenv('YATUBE_THUMBNAIL_WORKERS', 0 if DEBUG else 2)
+)
+THUMBNAIL_SIZES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_MAIN_SIZE = 'card'
+# Первый формат, который поддерживает Pillow, попадает в Post.thumbnail
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+
+# Загрузка картинок постов (см. posts.uploads): файлы больше
+# FILE_UPLOAD_MAX_MEMORY_SIZE пишутся кусками во временный файл, а не
+# держатся в памяти, а после UPLOAD_IMAGE_MAX_BYTES перестают записываться;
+# картинки больше UPLOAD_IMAGE_MAX_SIDE по длинной стороне уменьшаются до
+# сохранения.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'posts.uploads.LimitedUploadHandler',
+]
+UPLOAD_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+# JPEG декодируется сразу в уменьшенном масштабе (Image.draft), остальные
+# форматы — целиком: 12 Мп в RGBA — это около 48 МБ памяти воркера
+UPLOAD_IMAGE_MAX_PIXELS = 50_000_000
+UPLOAD_IMAGE_MAX_FULL_PIXELS = 12_000_000
+UPLOAD_IMAGE_MAX_SIDE = 2560
+UPLOAD_IMAGE_QUALITY = 85
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 ALLOWED_HOSTS = [
@@ -52,6 +101,8 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -63,6 +114,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,16 +126,32 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Доля запросов, для которых собираются метрики, по имени представления
+# вида 'posts:index'; '*' — для всех остальных
+REQUEST_METRICS_SAMPLING = {
+    '*': 1.0 if DEBUG else 0.01,
+}
+# Сколько последних измерений хранит /metrics/requests/ в каждом процессе
+REQUEST_METRICS_BUFFER_SIZE = 500
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
-
+# Шаблоны перечитываются с диска при каждом обращении только с
+# YATUBE_TEMPLATE_RELOAD=1 (по умолчанию при DEBUG). Иначе кэширующий
+# загрузчик разбирает каждый шаблон один раз на процесс.
+TEMPLATES_RELOAD = os.getenv(
+    'YATUBE_TEMPLATE_RELOAD', '1' if DEBUG else '0'
+) == '1'
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -90,9 +160,24 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
             ],
+            'loaders': TEMPLATE_LOADERS if TEMPLATES_RELOAD else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
         },
     },
 ]
+# Карточки постов в лентах рисует Jinja2 (нужен пакет jinja2), если
+# YATUBE_JINJA2=1; шаблоны карточек для него лежат в templates/jinja2.
+if os.getenv('YATUBE_JINJA2') == '1':
+    TEMPLATES.append({
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'NAME': 'jinja2',
+        'DIRS': [os.path.join(TEMPLATES_DIR, 'jinja2')],
+        'OPTIONS': {
+            'environment': 'yatube.jinja2.environment',
+            'auto_reload': TEMPLATES_RELOAD,
+        },
+    })
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
@@ -100,12 +185,74 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# База выбирается переменной окружения YATUBE_DB. Соединения живут
+# YATUBE_DB_CONN_MAX_AGE секунд и переиспользуются запросами того же
+# потока. Общий пул для PostgreSQL — PgBouncer перед базой: с
+# YATUBE_DB_POOLER=pgbouncer (режим transaction) серверные курсоры
+# отключаются, потому что не переживают смену соединения.
+DATABASE_CONN_MAX_AGE = int(os.getenv('YATUBE_DB_CONN_MAX_AGE', 60))
+DATABASE_BACKENDS = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.getenv(
+            'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.getenv('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.getenv('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.getenv('YATUBE_DB_HOST', '127.0.0.1'),
+        'PORT': os.getenv('YATUBE_DB_PORT', '5432'),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': (
+            os.getenv('YATUBE_DB_POOLER') == 'pgbouncer'
+        ),
+        'OPTIONS': {
+            'connect_timeout': 5,
+        },
+    },
+}
+DATABASES = {
+    'default': DATABASE_BACKENDS[os.getenv('YATUBE_DB', 'sqlite')],
+}
+# Реплики для чтения (core.routers): YATUBE_DB_REPLICAS — файлы SQLite
+# или хосты PostgreSQL через запятую. Файлы SQLite обновляет из основной
+# базы команда replicate. Пользователь, который что-то записал, следующие
+# YATUBE_DB_REPLICA_STICKINESS секунд читает основную базу.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        ('NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3')
+         else 'HOST'): location.strip(),
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICA_STICKINESS = int(
+    os.getenv('YATUBE_DB_REPLICA_STICKINESS', 10)
+)
+# Выполняются для каждого нового соединения SQLite (core.db): WAL пускает
+# чтение параллельно с записью, synchronous=NORMAL в режиме WAL не теряет
+# целостность, mmap читает файл базы без копирования в буферы SQLite.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
 }
+# Проверять базу при запуске WSGI-приложения и падать, если она недоступна
+DATABASE_CHECK_ON_STARTUP = os.getenv('YATUBE_DB_CHECK_ON_STARTUP', '1') == '1'
 
 
 # Password validation
@@ -148,10 +295,59 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
-CACHES = {
-    'default': {
+# Сборка статики — collectstatic: с YATUBE_STATIC_MANIFEST=1 (по умолчанию
+# без DEBUG) имена файлов получают хеш содержимого, а рядом кладутся
+# .gz/.br копии (core.storage). Файлы с хешем отдаются с Cache-Control
+# immutable на год: при изменении файла меняется и его адрес.
+STATIC_ROOT = os.getenv(
+    'YATUBE_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles')
+)
+if os.getenv('YATUBE_STATIC_MANIFEST', '0' if DEBUG else '1') == '1':
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStorage'
+# Отдавать STATIC_ROOT из Django (core.middleware.StaticFilesMiddleware),
+# когда перед gunicorn нет nginx
+STATIC_SERVE = os.getenv('YATUBE_SERVE_STATIC', '0' if DEBUG else '1') == '1'
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+# Кэш выбирается переменной окружения YATUBE_CACHE. locmem подходит только
+# для одного процесса: у каждого воркера gunicorn будет своя копия страниц
+# и версий. sqlite общий для воркеров на одной машине и не требует сервисов,
+# redis общий для нескольких машин.
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    'redis': {
+        'BACKEND': 'core.cache_backends.RedisCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', 'redis://127.0.0.1:6379/0'
+        ),
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('YATUBE_CACHE', 'locmem')],
 }
 
-CACHES_TIME_DEFAULT = 20
+# Страницы лент сбрасываются сигналами, а не по истечении времени
+CACHES_TIME_PAGES = 60 * 10
+# Карточки постов и списки id лент привязаны к версиям и живут дольше
+CACHES_TIME_FRAGMENTS = 60 * 60
+# Примерное число постов для нумерованных страниц
+CACHES_TIME_COUNTS = 60 * 5
+# Устаревшую страницу отдают ещё столько секунд, пока её пересобирают
+CACHES_TIME_STALE = 60
+# Сколько секунд держится блокировка пересборки страницы
+CACHES_LOCK_TIMEOUT = 10
+# Сколько секунд общий прокси отдаёт анонимную страницу без перепроверки
+CACHES_TIME_PROXY = 60
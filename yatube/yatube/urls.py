@@ -1,5 +1,5 @@
+from core.views import request_metrics, serve_media
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
@@ -12,9 +12,11 @@ urlpatterns = [
     path('', include('posts.urls', namespace='index')),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics/requests/', request_metrics, name='request_metrics'),
+    path(
+        settings.MEDIA_URL.lstrip('/') + '<path:name>',
+        serve_media,
+        name='media',
+    ),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )